@@ -0,0 +1,17 @@
+import React from 'react';
+
+const LoadMore = ({ hasMore, loading, onClick }) => {
+  if (!hasMore) {
+    return null;
+  }
+
+  return (
+    <div style={{ marginTop: '16px', textAlign: 'center' }}>
+      <button className="btn btn-primary" onClick={onClick} disabled={loading}>
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+};
+
+export default LoadMore;
@@ -0,0 +1,64 @@
+import { useState, useEffect, useCallback } from 'react';
+import axios from 'axios';
+import { API_URL } from '../context/AuthContext';
+
+// Admin lists are returned a page at a time; the X-Next-Cursor header points at the next page
+export const fetchPage = async (path, params = {}) => {
+  const response = await axios.get(`${API_URL}${path}`, { params });
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
+// Every page of a list, for lists that must be complete (e.g. pending withdrawals)
+export const fetchAllPages = async (path, params = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await fetchPage(path, cursor ? { ...params, cursor } : params);
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return items;
+};
+
+// Loads the first page of a list and appends further pages on demand.
+// params must keep the same identity between renders (define it outside the component).
+const usePagedList = (path, params) => {
+  const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const reload = useCallback(async () => {
+    try {
+      const page = await fetchPage(path, params);
+      setItems(page.items);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error(`Error fetching ${path}:`, error);
+    } finally {
+      setLoading(false);
+    }
+  }, [path, params]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(path, { ...params, cursor: nextCursor });
+      setItems((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error(`Error fetching ${path}:`, error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  useEffect(() => {
+    reload();
+  }, [reload]);
+
+  return { items, loading, loadingMore, hasMore: nextCursor !== null, loadMore, reload };
+};
+
+export default usePagedList;
@@ -1,30 +1,18 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
 import { API_URL } from '../context/AuthContext';
+import usePagedList from '../hooks/usePagedList';
+import LoadMore from '../components/LoadMore';
+
+const POLL_LIST_PARAMS = { fields: 'title,description,price_per_vote,status,option_count,options.option_id,options.text' };
 
 const Polls = () => {
-  const [polls, setPolls] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: polls, loading, loadingMore, hasMore, loadMore, reload: fetchPolls } = usePagedList('/admin/polls', POLL_LIST_PARAMS);
   const [selectedPoll, setSelectedPoll] = useState(null);
   const [showResultModal, setShowResultModal] = useState(false);
   const [selectedOption, setSelectedOption] = useState('');
 
-  useEffect(() => {
-    fetchPolls();
-  }, []);
-
-  const fetchPolls = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/admin/polls`);
-      setPolls(response.data);
-    } catch (error) {
-      console.error('Error fetching polls:', error);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleSetResult = async () => {
     if (!selectedOption) {
       alert('Please select a winning option');
@@ -40,7 +28,7 @@ const Polls = () => {
         `${API_URL}/admin/polls/${selectedPoll.poll_id}/result`,
         { winning_option_id: selectedOption }
       );
-      alert('Poll result set successfully! Winnings distributed.');
+      alert('Poll result set successfully! Winnings are being distributed.');
       setShowResultModal(false);
       fetchPolls();
     } catch (error) {
@@ -81,7 +69,7 @@ const Polls = () => {
                   <br />
                   <small style={{ color: '#64748b' }}>{poll.description}</small>
                 </td>
-                <td>{poll.options.length} options</td>
+                <td>{poll.option_count} options</td>
                 <td>₹{poll.price_per_vote}</td>
                 <td>
                   <span className={`badge ${poll.status === 'active' ? 'badge-success' : 'badge-danger'}`}>
@@ -108,6 +96,7 @@ const Polls = () => {
             ))}
           </tbody>
         </table>
+        <LoadMore hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
       </div>
 
       {showResultModal && (
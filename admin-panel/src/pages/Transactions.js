@@ -1,26 +1,12 @@
-import React, { useState, useEffect } from 'react';
-import axios from 'axios';
-import { API_URL } from '../context/AuthContext';
+import React, { useState } from 'react';
+import usePagedList from '../hooks/usePagedList';
+import LoadMore from '../components/LoadMore';
 
 const Transactions = () => {
-  const [transactions, setTransactions] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: transactions, loading, loadingMore, hasMore, loadMore } = usePagedList('/admin/transactions');
   const [filter, setFilter] = useState('all');
-
-  useEffect(() => {
-    fetchTransactions();
-  }, []);
-
-  const fetchTransactions = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/admin/transactions`);
-      setTransactions(response.data);
-    } catch (error) {
-      console.error('Error fetching transactions:', error);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // Counts cover the pages loaded so far
+  const more = hasMore ? '+' : '';
 
   const getTypeColor = (type) => {
     switch (type) {
@@ -53,25 +39,25 @@ const Transactions = () => {
             className={`btn ${filter === 'all' ? 'btn-primary' : ''}`}
             onClick={() => setFilter('all')}
           >
-            All ({transactions.length})
+            All ({transactions.length}{more})
           </button>
           <button 
             className={`btn ${filter === 'purchase' ? 'btn-primary' : ''}`}
             onClick={() => setFilter('purchase')}
           >
-            Purchases ({transactions.filter(t => t.type === 'purchase').length})
+            Purchases ({transactions.filter(t => t.type === 'purchase').length}{more})
           </button>
           <button 
             className={`btn ${filter === 'win' ? 'btn-primary' : ''}`}
             onClick={() => setFilter('win')}
           >
-            Winnings ({transactions.filter(t => t.type === 'win').length})
+            Winnings ({transactions.filter(t => t.type === 'win').length}{more})
           </button>
           <button 
             className={`btn ${filter === 'withdrawal' ? 'btn-primary' : ''}`}
             onClick={() => setFilter('withdrawal')}
           >
-            Withdrawals ({transactions.filter(t => t.type === 'withdrawal').length})
+            Withdrawals ({transactions.filter(t => t.type === 'withdrawal').length}{more})
           </button>
         </div>
       </div>
@@ -111,6 +97,7 @@ const Transactions = () => {
             ))}
           </tbody>
         </table>
+        <LoadMore hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
       </div>
     </div>
   );
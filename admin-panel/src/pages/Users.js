@@ -1,25 +1,9 @@
-import React, { useState, useEffect } from 'react';
-import axios from 'axios';
-import { API_URL } from '../context/AuthContext';
+import React from 'react';
+import usePagedList from '../hooks/usePagedList';
+import LoadMore from '../components/LoadMore';
 
 const Users = () => {
-  const [users, setUsers] = useState([]);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    fetchUsers();
-  }, []);
-
-  const fetchUsers = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/admin/users`);
-      setUsers(response.data);
-    } catch (error) {
-      console.error('Error fetching users:', error);
-    } finally {
-      setLoading(false);
-    }
-  };
+  const { items: users, loading, loadingMore, hasMore, loadMore } = usePagedList('/admin/users');
 
   if (loading) {
     return <div>Loading...</div>;
@@ -31,7 +15,7 @@ const Users = () => {
       
       <div className="card">
         <div style={{ marginBottom: '16px' }}>
-          <p style={{ color: '#64748b' }}>Total Users: <strong>{users.length}</strong></p>
+          <p style={{ color: '#64748b' }}>{hasMore ? 'Users loaded' : 'Total Users'}: <strong>{users.length}</strong></p>
         </div>
         
         <table className="table">
@@ -56,6 +40,7 @@ const Users = () => {
             ))}
           </tbody>
         </table>
+        <LoadMore hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
       </div>
     </div>
   );
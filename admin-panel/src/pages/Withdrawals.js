@@ -1,26 +1,33 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { API_URL } from '../context/AuthContext';
+import usePagedList, { fetchAllPages } from '../hooks/usePagedList';
+import LoadMore from '../components/LoadMore';
+
+const PENDING = { status: 'pending' };
 
 const Withdrawals = () => {
-  const [withdrawals, setWithdrawals] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: withdrawals, loading, loadingMore, hasMore, loadMore, reload } = usePagedList('/admin/withdrawals');
+  const [pendingWithdrawals, setPendingWithdrawals] = useState([]);
 
   useEffect(() => {
-    fetchWithdrawals();
+    fetchPending();
   }, []);
 
-  const fetchWithdrawals = async () => {
+  // Every pending request has to be reachable however old it is, so load all of them
+  const fetchPending = async () => {
     try {
-      const response = await axios.get(`${API_URL}/admin/withdrawals`);
-      setWithdrawals(response.data);
+      setPendingWithdrawals(await fetchAllPages('/admin/withdrawals', PENDING));
     } catch (error) {
-      console.error('Error fetching withdrawals:', error);
-    } finally {
-      setLoading(false);
+      console.error('Error fetching pending withdrawals:', error);
     }
   };
 
+  const fetchWithdrawals = () => {
+    fetchPending();
+    reload();
+  };
+
   const handleApprove = async (withdrawalId) => {
     if (!window.confirm('Are you sure you want to approve this withdrawal?')) {
       return;
@@ -61,9 +68,6 @@ const Withdrawals = () => {
     }
   };
 
-  const pendingWithdrawals = withdrawals.filter(w => w.status === 'pending');
-  const processedWithdrawals = withdrawals.filter(w => w.status !== 'pending');
-
   if (loading) {
     return <div>Loading...</div>;
   }
@@ -155,6 +159,7 @@ const Withdrawals = () => {
             ))}
           </tbody>
         </table>
+        <LoadMore hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
       </div>
     </div>
   );
@@ -1,20 +1,35 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Request, Response
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Request, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument, UpdateOne, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, BulkWriteError, DuplicateKeyError
 import os
+import time
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import uuid
+import random
+import re
+import hashlib
+import io
+import csv
+import json
+import base64
 from datetime import datetime, timezone, timedelta
 import httpx
 from passlib.context import CryptContext
 import jwt
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from PIL import Image, UnidentifiedImageError
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -29,13 +44,123 @@ CASHFREE_CLIENT_ID = os.getenv("CASHFREE_CLIENT_ID", "TEST432972d3f54ef1104fb751
 CASHFREE_CLIENT_SECRET = os.getenv("CASHFREE_CLIENT_SECRET", "TEST51637902e758909219e83f5678b467a4afe7ab8c")
 CASHFREE_ENV = os.getenv("CASHFREE_ENV", "TEST")
 CASHFREE_API_VERSION = "2023-08-01"
+CASHFREE_BASE_URL = os.getenv("CASHFREE_BASE_URL", "https://sandbox.cashfree.com")
+EMERGENT_AUTH_BASE_URL = os.getenv("EMERGENT_AUTH_BASE_URL", "https://demobackend.emergentagent.com")
+
+# Outbound HTTP: one keep-alive pooled client per upstream host, created at startup
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# Cashfree order creation: total time a purchase waits for the gateway, and the circuit
+# breaker that fails purchases fast once it keeps failing (consecutive failures to open,
+# seconds before a single probe request is let through)
+CASHFREE_ORDER_TIMEOUT = float(os.getenv("CASHFREE_ORDER_TIMEOUT", "5"))
+CASHFREE_BREAKER_FAILURES = int(os.getenv("CASHFREE_BREAKER_FAILURES", "5"))
+CASHFREE_BREAKER_RESET_SECONDS = float(os.getenv("CASHFREE_BREAKER_RESET_SECONDS", "30"))
+# Test setups only: credit purchases without payment when a Cashfree order can't be created
+PAYMENT_AUTO_APPROVE = os.getenv("PAYMENT_AUTO_APPROVE", "false").lower() == "true"
 
 # Secret key for admin JWT
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+DEFAULT_SECRET_KEY = "your-secret-key-change-in-production"
+SECRET_KEY = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
 ALGORITHM = "HS256"
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# User sessions: "opaque" tokens are looked up in user_sessions on every request,
+# "signed" tokens are self-contained JWTs checked only against a revocation set
+USER_SESSION_MODE = os.getenv("USER_SESSION_MODE", "opaque")
+USER_SESSION_SECRET = os.getenv("USER_SESSION_SECRET", SECRET_KEY)
+USER_SESSION_DAYS = 7
+SESSION_REVOCATION_REFRESH = float(os.getenv("SESSION_REVOCATION_REFRESH", "5"))
+if USER_SESSION_MODE == "signed" and USER_SESSION_SECRET == DEFAULT_SECRET_KEY:
+    # Anyone could sign a session for any user with the published placeholder
+    raise RuntimeError("USER_SESSION_MODE=signed needs USER_SESSION_SECRET (or SECRET_KEY) set to a real secret")
+
+# Poll settlement jobs: winners credited per bulk write, chunks credited concurrently,
+# how long a worker's claim on a job lasts without a checkpoint, and retry limits
+SETTLEMENT_CHUNK_SIZE = int(os.getenv("SETTLEMENT_CHUNK_SIZE", "1000"))
+SETTLEMENT_WORKERS = int(os.getenv("SETTLEMENT_WORKERS", "4"))
+SETTLEMENT_LEASE_SECONDS = int(os.getenv("SETTLEMENT_LEASE_SECONDS", "60"))
+SETTLEMENT_MAX_ATTEMPTS = int(os.getenv("SETTLEMENT_MAX_ATTEMPTS", "5"))
+SETTLEMENT_SWEEP_INTERVAL = int(os.getenv("SETTLEMENT_SWEEP_INTERVAL", "30"))
+
+# Payment webhook inbox: consumers per process, attempts before an event is dead-lettered,
+# retry backoff (doubling from the base, capped), how long a consumer's claim on an event
+# lasts, how often idle consumers look for due retries, and how long processed events are
+# kept for deduplication
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "2"))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "600"))
+WEBHOOK_LEASE_SECONDS = int(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "1"))
+WEBHOOK_RETENTION_DAYS = int(os.getenv("WEBHOOK_RETENTION_DAYS", "30"))
+
+# Identifies this process when it claims background jobs
+WORKER_ID = f"worker_{uuid.uuid4().hex[:8]}"
+
+# Keyset pagination for list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Documents fetched per round trip when streaming admin exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Poll option images are stored once per content hash, either in GridFS ("gridfs")
+# or under IMAGE_STORE_DIR ("local"), and served from /api/images/{hash}.
+# Thumbnails are generated in a process pool when the image is uploaded.
+IMAGE_STORE = os.getenv("IMAGE_STORE", "gridfs")
+IMAGE_STORE_DIR = Path(os.getenv("IMAGE_STORE_DIR", str(ROOT_DIR / "images")))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "256"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# How long a worker's claim on a poll lasts while moving its inline images out at startup
+IMAGE_MIGRATION_LEASE_SECONDS = int(os.getenv("IMAGE_MIGRATION_LEASE_SECONDS", "300"))
+image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+
+# Admin dashboard analytics are served from a snapshot refreshed this often (seconds)
+ANALYTICS_REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "30"))
+
+# Resolved user sessions are cached in-process for at most this many seconds
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+# Public poll results are computed once per poll by concurrent readers and reused for this long
+RESULTS_CACHE_TTL = float(os.getenv("RESULTS_CACHE_TTL", "1.5"))
+RESULTS_CACHE_SIZE = int(os.getenv("RESULTS_CACHE_SIZE", "1000"))
+
+# Optional group commit for votes: queue them and write up to VOTE_BATCH_SIZE per insert_many,
+# flushing at least every VOTE_BATCH_INTERVAL_MS. Beyond VOTE_QUEUE_MAX waiting votes,
+# new votes wait VOTE_QUEUE_TIMEOUT seconds for room before being rejected with a 503.
+VOTE_BATCHING = os.getenv("VOTE_BATCHING", "false").lower() == "true"
+VOTE_BATCH_SIZE = int(os.getenv("VOTE_BATCH_SIZE", "500"))
+VOTE_BATCH_INTERVAL_MS = float(os.getenv("VOTE_BATCH_INTERVAL_MS", "5"))
+VOTE_QUEUE_MAX = int(os.getenv("VOTE_QUEUE_MAX", "10000"))
+VOTE_QUEUE_TIMEOUT = float(os.getenv("VOTE_QUEUE_TIMEOUT", "1"))
+
+# Hot polls spread their vote counters over poll_counter_shards documents. A poll that takes
+# more than COUNTER_SHARD_HOT_WRITES counter writes per second on one worker gets
+# COUNTER_SHARD_INITIAL shards, doubled each time it is still hot, up to COUNTER_SHARD_MAX.
+COUNTER_SHARD_HOT_WRITES = float(os.getenv("COUNTER_SHARD_HOT_WRITES", "50"))
+COUNTER_SHARD_INITIAL = int(os.getenv("COUNTER_SHARD_INITIAL", "4"))
+COUNTER_SHARD_MAX = int(os.getenv("COUNTER_SHARD_MAX", "64"))
+
+# Live results streams: at most one broadcast per poll per interval, keep-alives when idle
+LIVE_BROADCAST_INTERVAL = float(os.getenv("LIVE_BROADCAST_INTERVAL", "1"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+
+# Password hashing. Hashes with a different cost are upgraded on the next successful login.
+# bcrypt runs in a small dedicated pool so logins never block the event loop; requests
+# beyond PASSWORD_HASH_MAX_PENDING queued jobs are turned away with a 503.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
 
 # Create the main app
 app = FastAPI()
@@ -56,52 +181,18 @@ async def serve_web_app():
 from fastapi.responses import HTMLResponse, RedirectResponse
 
 @app.get("/api/payment/callback", include_in_schema=False)
-async def payment_callback(poll_id: str = "", order_id: str = "", user_id: str = "", vote_count: str = "1", option_id: str = ""):
+async def payment_callback(order_id: str = "", option_id: str = ""):
     """Handle payment callback - cast vote and redirect to web app"""
     
     # Try to cast the vote automatically
     vote_success = False
     error_message = ""
     
-    if poll_id and user_id and option_id:
+    if order_id:
         try:
-            # Find the user
-            user = await db.users.find_one({"user_id": user_id})
-            if user:
-                # Check if vote already exists for this order
-                existing_vote = await db.votes.find_one({
-                    "user_id": user_id,
-                    "poll_id": poll_id,
-                    "cashfree_order_id": order_id
-                })
-                
-                if not existing_vote:
-                    # Get the poll to calculate amount
-                    poll = await db.polls.find_one({"poll_id": poll_id})
-                    price_per_vote = poll.get("price_per_vote", 1) if poll else 1
-                    amount_paid = int(vote_count) * price_per_vote
-                    
-                    # Cast the vote
-                    vote = {
-                        "vote_id": f"vote_{uuid.uuid4().hex[:12]}",
-                        "user_id": user_id,
-                        "poll_id": poll_id,
-                        "option_id": option_id,
-                        "vote_count": int(vote_count),
-                        "amount_paid": amount_paid,
-                        "cashfree_order_id": order_id,
-                        "created_at": datetime.now(timezone.utc)
-                    }
-                    await db.votes.insert_one(vote)
-                    
-                    # Update transaction status
-                    await db.transactions.update_one(
-                        {"cashfree_order_id": order_id},
-                        {"$set": {"status": "success"}}
-                    )
-                    vote_success = True
-                else:
-                    vote_success = True  # Already voted
+            vote_success = await apply_paid_order(order_id, option_id)
+            if not vote_success:
+                error_message = "Payment not found"
         except Exception as e:
             error_message = str(e)
             logger.error(f"Payment callback error: {e}")
@@ -235,7 +326,8 @@ class UserLogin(BaseModel):
 class PollOption(BaseModel):
     option_id: str
     text: str
-    image_base64: Optional[str] = None
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
 
 class Poll(BaseModel):
     poll_id: str
@@ -251,7 +343,7 @@ class Poll(BaseModel):
 class CreatePoll(BaseModel):
     title: str
     description: str
-    options: List[Dict[str, str]]  # [{"text": "Option 1", "image_base64": "..."}]
+    options: List[Dict[str, str]]  # [{"text": "Option 1", "image_base64": "..."}] or an existing "image_url"
     price_per_vote: float = 1.0
 
 class Vote(BaseModel):
@@ -313,11 +405,1711 @@ class UpdateUPIRequest(BaseModel):
 
 # ============= HELPER FUNCTIONS =============
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class TTLCache:
+    """Bounded in-process LRU cache whose entries also expire after a TTL"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+    
+    def pop_where(self, predicate) -> int:
+        """Drop every entry whose value matches predicate"""
+        keys = [k for k, (value, _) in self._data.items() if predicate(value)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+    
+    def clear(self):
+        self._data.clear()
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class CoalescingCache:
+    """TTLCache front with per-key single-flight: concurrent misses share one computation.
+    
+    invalidate() drops the cached value and detaches any in-flight computation, so a read
+    that started before a write can still answer its waiters but never repopulates the cache.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize, ttl)
+        self.flights: Dict[Any, asyncio.Task] = {}
+        self.coalesced = 0
+    
+    async def get(self, key, compute):
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._run(key, compute))
+            self.flights[key] = flight
+        else:
+            self.coalesced += 1
+        # Shielded so one caller going away doesn't cancel the computation for everyone else
+        return await asyncio.shield(flight)
+    
+    async def _run(self, key, compute):
+        task = asyncio.current_task()
+        try:
+            value = await compute()
+            if self.flights.get(key) is task:
+                self.cache.set(key, value)
+            return value
+        finally:
+            if self.flights.get(key) is task:
+                del self.flights[key]
+    
+    def invalidate(self, key):
+        self.cache.pop(key)
+        self.flights.pop(key, None)
+    
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "in_flight": len(self.flights), "coalesced": self.coalesced}
+
+# poll_id -> (version, results body). Other workers' copies expire within RESULTS_CACHE_TTL.
+results_cache = CoalescingCache(RESULTS_CACHE_SIZE, RESULTS_CACHE_TTL)
+
+# session_token -> (User, session expires_at)
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+def invalidate_user_sessions(user_id: str):
+    """Forget every cached session resolving to this user"""
+    session_cache.pop_where(lambda entry: entry[0].user_id == user_id)
+
+class SessionRevocations:
+    """In-memory view of revoked signed sessions, refreshed incrementally from session_revocations.
+    
+    Holds individual token ids (logout) and per-user cut-offs (every token issued before
+    a point in time, e.g. when the user is deleted). Both stay small: revocations are only
+    kept until the tokens they cover would have expired anyway.
+    """
+    
+    def __init__(self):
+        self.token_ids = set()
+        self.users = {}
+        self.last_refresh = None
+    
+    def is_revoked(self, token_id: str, user_id: str, issued_at: float) -> bool:
+        if token_id in self.token_ids:
+            return True
+        revoked_before = self.users.get(user_id)
+        return revoked_before is not None and issued_at < revoked_before
+    
+    def apply(self, doc: dict):
+        if doc.get("token_id"):
+            self.token_ids.add(doc["token_id"])
+        else:
+            revoked_before = doc["revoked_before"]
+            if revoked_before.tzinfo is None:
+                revoked_before = revoked_before.replace(tzinfo=timezone.utc)
+            self.users[doc["user_id"]] = max(self.users.get(doc["user_id"], 0), revoked_before.timestamp())
+    
+    async def refresh(self):
+        now = datetime.now(timezone.utc)
+        query = {"expires_at": {"$gt": now}}
+        if self.last_refresh:
+            # Overlap the window slightly so revocations written by other workers aren't missed
+            query["created_at"] = {"$gte": self.last_refresh - timedelta(seconds=SESSION_REVOCATION_REFRESH)}
+        else:
+            self.token_ids.clear()
+            self.users.clear()
+        async for doc in db.session_revocations.find(query, {"_id": 0}):
+            self.apply(doc)
+        self.last_refresh = now
+    
+    async def revoke(self, doc: dict):
+        doc["created_at"] = datetime.now(timezone.utc)
+        self.apply(doc)
+        await db.session_revocations.insert_one(doc)
+
+session_revocations = SessionRevocations()
+
+async def refresh_session_revocations():
+    """Keep this worker's revocation set in step with revocations made on other workers"""
+    while True:
+        try:
+            await session_revocations.refresh()
+        except Exception as e:
+            logger.error(f"Session revocation refresh error: {e}")
+        await asyncio.sleep(SESSION_REVOCATION_REFRESH)
+
+def is_signed_session_token(token: str) -> bool:
+    # Outside signed mode a JWT-shaped token is just an unknown opaque session
+    return USER_SESSION_MODE == "signed" and token.count(".") == 2
+
+def create_signed_session_token(user_doc: dict, expires_at: datetime) -> str:
+    """Issue a self-contained user session carrying the user's profile"""
+    created_at = user_doc.get("created_at") or datetime.now(timezone.utc)
+    payload = {
+        "typ": "user",
+        "jti": uuid.uuid4().hex,
+        "user_id": user_doc["user_id"],
+        "email": user_doc["email"],
+        "name": user_doc["name"],
+        "picture": user_doc.get("picture"),
+        "upi_id": user_doc.get("upi_id"),
+        "created_at": created_at.isoformat(),
+        # Sub-second, so a token issued right after a revocation cut-off isn't covered by it
+        "iat": time.time(),
+        "exp": expires_at
+    }
+    return jwt.encode(payload, USER_SESSION_SECRET, algorithm=ALGORITHM)
+
+def decode_signed_session_token(token: str) -> dict:
+    if USER_SESSION_SECRET == DEFAULT_SECRET_KEY:
+        # Anyone can sign with the published placeholder, so nothing signed with it is trusted
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+    try:
+        payload = jwt.decode(token, USER_SESSION_SECRET, algorithms=[ALGORITHM])
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired")
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+    if payload.get("typ") != "user" or not payload.get("user_id"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+    return payload
+
+def set_session_cookie(response: Response, session_token: str):
+    response.set_cookie(
+        key="session_token",
+        value=session_token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        max_age=USER_SESSION_DAYS * 24 * 60 * 60,
+        path="/"
+    )
+
+async def create_user_session(user_doc: dict, response: Response, session_token: Optional[str] = None) -> str:
+    """Start a session for the user in the configured session mode and set the cookie"""
+    expires_at = datetime.now(timezone.utc) + timedelta(days=USER_SESSION_DAYS)
+    if USER_SESSION_MODE == "signed":
+        session_token = create_signed_session_token(user_doc, expires_at)
+    else:
+        session_token = session_token or f"session_{uuid.uuid4().hex}"
+        session_doc = {
+            "user_id": user_doc["user_id"],
+            "session_token": session_token,
+            "expires_at": expires_at,
+            "created_at": datetime.now(timezone.utc)
+        }
+        await db.user_sessions.insert_one(session_doc)
+    
+    set_session_cookie(response, session_token)
+    return session_token
+
+async def revoke_signed_session(payload: dict):
+    """Revoke a single signed session until it would have expired"""
+    await session_revocations.revoke({
+        "token_id": payload["jti"],
+        "user_id": payload["user_id"],
+        "expires_at": datetime.fromtimestamp(payload["exp"], timezone.utc)
+    })
+
+async def revoke_signed_sessions(user_id: str):
+    """Revoke every signed session issued to the user so far, e.g. when the profile they carry changes"""
+    now = datetime.now(timezone.utc)
+    await session_revocations.revoke({
+        "user_id": user_id,
+        "revoked_before": now,
+        "expires_at": now + timedelta(days=USER_SESSION_DAYS)
+    })
+
+async def revoke_user_sessions(user_id: str):
+    """Invalidate every session the user holds, opaque or signed"""
+    await db.user_sessions.delete_many({"user_id": user_id})
+    invalidate_user_sessions(user_id)
+    await revoke_signed_sessions(user_id)
+
+password_pool_stats = {"pending": 0, "completed": 0, "rejected": 0}
+
+async def run_password_job(fn, *args):
+    """Run a bcrypt call on the password pool, refusing work once the queue is full"""
+    if password_pool_stats["pending"] >= PASSWORD_HASH_MAX_PENDING:
+        password_pool_stats["rejected"] += 1
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, please try again")
+    password_pool_stats["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        password_pool_stats["pending"] -= 1
+        password_pool_stats["completed"] += 1
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> tuple:
+    """Returns (valid, new_hash); new_hash is set when the stored hash should be upgraded"""
+    return await run_password_job(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def empty_tally() -> dict:
+    return {"vote_count": 0, "amount": 0.0, "voter_count": 0}
+
+# Bumped when new per-poll aggregates are introduced; polls below it are rebuilt at startup
+POLL_AGGREGATES_VERSION = 2
+
+async def backfill_option_counts():
+    # A single server-side update: safe to run from every worker, and unlike a rebuild
+    # it never touches the counters that concurrent votes are incrementing
+    return await db.polls.update_many(
+        {"option_count": {"$exists": False}},
+        [{"$set": {"option_count": {"$size": "$options"}}}]
+    )
+
+def summary_poll_fields(poll: dict) -> dict:
+    """Poll fields copied onto each user_poll_summary so history reads need no poll lookup"""
+    return {
+        "title": poll["title"],
+        "description": poll.get("description", ""),
+        "price_per_vote": poll["price_per_vote"],
+        "poll_created_at": poll.get("created_at")
+    }
+
+# Running counters kept on the poll document (or spread over its counter shards)
+POLL_COUNTER_FIELDS = ["total_votes", "total_amount", "voter_count", "version"]
+
+class PollWriteRates:
+    """Per-worker counter-write rate for each poll, measured over one-second windows"""
+    
+    def __init__(self):
+        self.windows: Dict[str, list] = {}
+    
+    def record(self, poll_id: str) -> Optional[float]:
+        """Count a write; returns the rate when a window closes"""
+        now = time.monotonic()
+        window = self.windows.setdefault(poll_id, [now, 0])
+        window[1] += 1
+        elapsed = now - window[0]
+        if elapsed < 1:
+            return None
+        rate = window[1] / elapsed
+        del self.windows[poll_id]
+        return rate
+
+poll_write_rates = PollWriteRates()
+
+async def apply_poll_counters(poll: dict, inc: dict):
+    """$inc a poll's running counters, on a random counter shard once the poll is hot"""
+    poll_id = poll["poll_id"]
+    shards = poll.get("counter_shards", 0)
+    if shards:
+        await db.poll_counter_shards.update_one(
+            {"poll_id": poll_id, "shard": random.randrange(shards)},
+            {"$inc": inc},
+            upsert=True
+        )
+    else:
+        await db.polls.update_one({"poll_id": poll_id}, {"$inc": inc})
+    results_cache.invalidate(poll_id)
+    
+    rate = poll_write_rates.record(poll_id)
+    if rate is not None and rate > COUNTER_SHARD_HOT_WRITES and shards < COUNTER_SHARD_MAX:
+        target = min(max(shards * 2, COUNTER_SHARD_INITIAL), COUNTER_SHARD_MAX)
+        result = await db.polls.update_one(
+            {"poll_id": poll_id, "counter_shards": {"$not": {"$gte": target}}},
+            {"$set": {"counter_shards": target}}
+        )
+        if result.modified_count:
+            logger.info(f"Poll {poll_id} is taking {rate:.0f} writes/s; spreading its counters over {target} shards")
+
+async def load_counter_shards(poll_ids: List[str]) -> Dict[str, dict]:
+    """Sum the counter shards of the given polls"""
+    totals = {}
+    if not poll_ids:
+        return totals
+    async for shard in db.poll_counter_shards.find({"poll_id": {"$in": poll_ids}}, {"_id": 0, "shard": 0}):
+        total = totals.setdefault(shard["poll_id"], {"tallies": {}})
+        for field in POLL_COUNTER_FIELDS:
+            total[field] = total.get(field, 0) + shard.get(field, 0)
+        for option_id, tally in shard.get("tallies", {}).items():
+            option_total = total["tallies"].setdefault(option_id, empty_tally())
+            for field, value in tally.items():
+                option_total[field] = option_total.get(field, 0) + value
+    return totals
+
+async def merge_counter_shards(polls: List[dict]) -> List[dict]:
+    """Fold counter shards into poll documents read with counter_shards projected in.
+    
+    Only fields already present on each poll are updated, so sparse projections stay sparse.
+    """
+    sharded = [poll["poll_id"] for poll in polls if poll.pop("counter_shards", 0)]
+    totals = await load_counter_shards(sharded)
+    for poll in polls:
+        total = totals.get(poll["poll_id"])
+        if not total:
+            continue
+        for field in POLL_COUNTER_FIELDS:
+            if field in poll:
+                poll[field] = poll[field] + total.get(field, 0)
+        if "tallies" in poll:
+            for option_id, tally in total["tallies"].items():
+                option_tally = poll["tallies"].setdefault(option_id, empty_tally())
+                for field, value in tally.items():
+                    option_tally[field] = option_tally.get(field, 0) + value
+    return polls
+
+async def record_vote_summary(poll: dict, user_id: str, option_votes: Dict[str, tuple]) -> dict:
+    """Apply a user's new votes on a poll ({option_id: (vote_count, amount)}) to their poll summary.
+    
+    Returns the $inc to apply to the poll's tallies.
+    """
+    option_text = {opt["option_id"]: opt["text"] for opt in poll["options"]}
+    now = datetime.now(timezone.utc)
+    summary_inc = {"total_votes": 0, "total_spent": 0}
+    summary_set = {"updated_at": now}
+    for option_id, (vote_count, amount) in option_votes.items():
+        summary_inc["total_votes"] += vote_count
+        summary_inc["total_spent"] += amount
+        summary_inc[f"options.{option_id}.vote_count"] = vote_count
+        summary_inc[f"options.{option_id}.amount"] = amount
+        summary_set[f"options.{option_id}.option_text"] = option_text.get(option_id, "Unknown")
+    
+    # One summary per (user, poll); its pre-update image tells us atomically whether
+    # this is the user's first vote on the poll and on each option
+    summary = await db.user_poll_summary.find_one_and_update(
+        {"user_id": user_id, "poll_id": poll["poll_id"]},
+        {
+            "$inc": summary_inc,
+            "$set": summary_set,
+            "$setOnInsert": {
+                **summary_poll_fields(poll),
+                "poll_status": poll.get("status", "active"),
+                "winning_option_id": poll.get("result_option_id"),
+                "result_status": "pending",
+                "winning_amount": 0,
+                "created_at": now
+            }
+        },
+        projection={"_id": 0, "options": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    
+    inc = {
+        "total_votes": summary_inc["total_votes"],
+        "total_amount": summary_inc["total_spent"]
+    }
+    if summary is None:
+        inc["voter_count"] = 1
+    for option_id, (vote_count, amount) in option_votes.items():
+        inc[f"tallies.{option_id}.vote_count"] = vote_count
+        inc[f"tallies.{option_id}.amount"] = amount
+        if summary is None or option_id not in summary.get("options", {}):
+            inc[f"tallies.{option_id}.voter_count"] = 1
+    return inc
+
+async def record_vote_tally(poll: dict, option_id: str, user_id: str, vote_count: int, amount: float):
+    """Apply a newly inserted vote to the poll's running tallies and the user's poll summary"""
+    inc = await record_vote_summary(poll, user_id, {option_id: (vote_count, amount)})
+    inc["version"] = 1
+    await apply_poll_counters(poll, inc)
+
+async def record_vote_batch(entries: List[tuple]):
+    """Apply a batch of inserted (vote, poll) pairs: one summary update per (user, poll)
+    and one merged $inc per poll, instead of two writes per vote."""
+    if not entries:
+        return
+    polls = {}
+    grouped = {}
+    for vote, poll in entries:
+        polls[poll["poll_id"]] = poll
+        option_votes = grouped.setdefault((poll["poll_id"], vote["user_id"]), {})
+        vote_count, amount = option_votes.get(vote["option_id"], (0, 0))
+        option_votes[vote["option_id"]] = (vote_count + vote["vote_count"], amount + vote["amount_paid"])
+    
+    incs = await asyncio.gather(*[
+        record_vote_summary(polls[poll_id], user_id, option_votes)
+        for (poll_id, user_id), option_votes in grouped.items()
+    ])
+    merged = {}
+    for (poll_id, _), inc in zip(grouped, incs):
+        poll_inc = merged.setdefault(poll_id, {"version": 1})
+        for field, value in inc.items():
+            poll_inc[field] = poll_inc.get(field, 0) + value
+    
+    await asyncio.gather(*[apply_poll_counters(polls[poll_id], inc) for poll_id, inc in merged.items()])
+
+class VoteIngestor:
+    """Group-commits votes: requests queue their vote and wait while a single writer
+    flushes up to VOTE_BATCH_SIZE votes (or whatever arrived within VOTE_BATCH_INTERVAL_MS)
+    with one insert_many and batched tally updates.
+    
+    A request is acknowledged only after its batch is written. When VOTE_QUEUE_MAX votes
+    are already waiting, new ones wait up to VOTE_QUEUE_TIMEOUT seconds for room and are
+    then turned away with a 503.
+    """
+    
+    def __init__(self, batch_size: int, interval: float, max_pending: int, enqueue_timeout: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enqueue_timeout = enqueue_timeout
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.runner: Optional[asyncio.Task] = None
+        self.busy = False
+        self.batches = 0
+        self.votes = 0
+        self.largest_batch = 0
+        self.rejected = 0
+    
+    def start(self):
+        self.runner = spawn_background(self.run())
+    
+    async def submit(self, vote: dict, poll: Optional[dict]):
+        done = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self.queue.put((vote, poll, done)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many votes in flight, please retry")
+        await asyncio.shield(done)
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            self.busy = True
+            try:
+                deadline = loop.time() + self.interval
+                while len(batch) < self.batch_size:
+                    if not self.queue.empty():
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self.flush(batch)
+            finally:
+                self.busy = False
+    
+    async def flush(self, batch: List[tuple]):
+        failed = {}
+        try:
+            await db.votes.insert_many([vote for vote, _, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            # A duplicate key is reported to its submitter as such (e.g. a paid order's vote
+            # that is already recorded); anything else fails with the whole bulk error
+            failed = {
+                error["index"]: DuplicateKeyError(error.get("errmsg", ""), error["code"], error) if error.get("code") == 11000 else e
+                for error in e.details.get("writeErrors", [])
+            }
+            if not failed:
+                failed = {i: e for i in range(len(batch))}
+        except Exception as e:
+            failed = {i: e for i in range(len(batch))}
+        written = [entry for i, entry in enumerate(batch) if i not in failed]
+        
+        try:
+            await record_vote_batch([(vote, poll) for vote, poll, _ in written if poll])
+        except Exception as e:
+            # The votes themselves are stored; tallies can be rebuilt from them
+            logger.error(f"Vote batch tally error: {e}")
+        
+        self.batches += 1
+        self.votes += len(written)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for i, (_, _, done) in enumerate(batch):
+            if done.done():
+                continue
+            if i in failed:
+                done.set_exception(failed[i])
+            else:
+                done.set_result(None)
+    
+    async def drain(self):
+        """Let the writer flush whatever is still queued, then stop it"""
+        if not self.runner:
+            return
+        while not self.runner.done() and (self.busy or not self.queue.empty()):
+            await asyncio.sleep(self.interval)
+        self.runner.cancel()
+    
+    def stats(self) -> dict:
+        return {
+            "enabled": VOTE_BATCHING,
+            "queued": self.queue.qsize(),
+            "max_pending": self.queue.maxsize,
+            "batches": self.batches,
+            "votes": self.votes,
+            "largest_batch": self.largest_batch,
+            "average_batch": round(self.votes / self.batches, 2) if self.batches else 0.0,
+            "rejected": self.rejected
+        }
+
+vote_ingestor = VoteIngestor(VOTE_BATCH_SIZE, VOTE_BATCH_INTERVAL_MS / 1000, VOTE_QUEUE_MAX, VOTE_QUEUE_TIMEOUT)
+
+async def apply_paid_order(order_id: str, option_id: str = "") -> bool:
+    """Mark a purchase paid and cast its votes; safe to run any number of times per order.
+    
+    Each step is idempotent on its own, so a call that failed part-way is finished by the
+    next one: the purchased votes are credited once per order, the vote goes through
+    store_vote and the unique cashfree_order_id index on votes turns a repeat into a
+    duplicate key, and the cast votes are recorded once per order after the vote is stored.
+    Returns False when there is no such order.
+    """
+    txn = await db.transactions.find_one_and_update(
+        {"cashfree_order_id": order_id, "type": "purchase"},
+        {"$set": {"status": "success"}},
+        projection={"_id": 0}
+    )
+    if not txn:
+        return False
+    
+    user_id = txn["user_id"]
+    poll_id = txn["poll_id"]
+    vote_count = int(txn.get("vote_count", 0))
+    option_id = txn.get("option_id") or option_id
+    if vote_count <= 0:
+        return True
+    
+    await apply_order_to_vote_balance(user_id, poll_id, order_id, purchased=vote_count)
+    
+    if option_id:
+        vote = {
+            "vote_id": f"vote_{uuid.uuid4().hex[:12]}",
+            "user_id": user_id,
+            "poll_id": poll_id,
+            "option_id": option_id,
+            "vote_count": vote_count,
+            "amount_paid": txn["amount"],
+            "cashfree_order_id": order_id,
+            "transaction_id": txn["transaction_id"],
+            "created_at": datetime.now(timezone.utc)
+        }
+        poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
+        try:
+            await store_vote(vote, poll)
+        except DuplicateKeyError:
+            # An earlier or concurrent delivery of the same order recorded the vote
+            pass
+        await apply_order_to_vote_balance(user_id, poll_id, order_id, cast=vote_count)
+    return True
+
+async def store_vote(vote: dict, poll: Optional[dict]):
+    """Persist a vote and apply it to the tallies, through the group-commit queue when enabled.
+    
+    Raises only when the vote itself was not stored.
+    """
+    if VOTE_BATCHING:
+        await vote_ingestor.submit(vote, poll)
+        return
+    await db.votes.insert_one(vote)
+    if poll:
+        try:
+            await record_vote_tally(poll, vote["option_id"], vote["user_id"], vote["vote_count"], vote["amount_paid"])
+        except Exception as e:
+            # The vote itself is stored; tallies can be rebuilt from it
+            logger.error(f"Vote tally error: {e}")
+
+async def rebuild_poll_aggregates(poll: dict):
+    """Recompute a poll's tallies and its users' poll summaries from the raw votes"""
+    poll_id = poll["poll_id"]
+    option_text = {opt["option_id"]: opt["text"] for opt in poll["options"]}
+    tallies = {}
+    summaries = {}
+    async for row in db.votes.aggregate([
+        {"$match": {"poll_id": poll_id}},
+        {"$group": {
+            "_id": {"option_id": "$option_id", "user_id": "$user_id"},
+            "vote_count": {"$sum": "$vote_count"},
+            "amount": {"$sum": "$amount_paid"}
+        }}
+    ], allowDiskUse=True):
+        option_id = row["_id"]["option_id"]
+        tally = tallies.setdefault(option_id, empty_tally())
+        tally["vote_count"] += row["vote_count"]
+        tally["amount"] += row["amount"]
+        tally["voter_count"] += 1
+        
+        summary = summaries.setdefault(row["_id"]["user_id"], {"total_votes": 0, "total_spent": 0, "options": {}})
+        summary["total_votes"] += row["vote_count"]
+        summary["total_spent"] += row["amount"]
+        summary["options"][option_id] = {
+            "vote_count": row["vote_count"],
+            "amount": row["amount"],
+            "option_text": option_text.get(option_id, "Unknown")
+        }
+    
+    if summaries:
+        winnings = {}
+        async for txn in db.transactions.find({"poll_id": poll_id, "type": "win"}, {"_id": 0, "user_id": 1, "amount": 1}):
+            winnings.setdefault(txn["user_id"], txn["amount"])
+        
+        closed = poll["status"] == "closed" and poll.get("result_option_id")
+        now = datetime.now(timezone.utc)
+        await db.user_poll_summary.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "poll_id": poll_id},
+                {
+                    "$set": {
+                        **summary,
+                        **summary_poll_fields(poll),
+                        "poll_status": poll["status"],
+                        "winning_option_id": poll.get("result_option_id"),
+                        "result_status": ("won" if poll["result_option_id"] in summary["options"] else "lost") if closed else "pending",
+                        "winning_amount": winnings.get(user_id, 0),
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"created_at": poll.get("created_at") or now}
+                },
+                upsert=True
+            )
+            for user_id, summary in summaries.items()
+        ], ordered=False)
+    
+    # The rebuilt totals replace any counter shards; carry their versions over so the
+    # poll's version (and ETag) never moves backwards
+    shard_version = (await load_counter_shards([poll_id])).get(poll_id, {}).get("version", 0)
+    await db.poll_counter_shards.delete_many({"poll_id": poll_id})
+    await db.polls.update_one(
+        {"poll_id": poll_id},
+        {"$set": {
+            "tallies": tallies,
+            "total_votes": sum(t["vote_count"] for t in tallies.values()),
+            "total_amount": sum(t["amount"] for t in tallies.values()),
+            "voter_count": len(summaries),
+            "option_count": len(poll["options"]),
+            "aggregates_version": POLL_AGGREGATES_VERSION
+        }, "$inc": {"version": 1 + shard_version}}
+    )
+    results_cache.invalidate(poll_id)
+
+def summary_voted_options(summary: dict) -> List[dict]:
+    return [
+        {
+            "option_id": option_id,
+            "option_text": option["option_text"],
+            "vote_count": option["vote_count"],
+            "amount": option["amount"]
+        }
+        for option_id, option in summary.get("options", {}).items()
+    ]
+
+async def adjust_vote_balance(user_id: str, poll_id: str, purchased: int = 0, cast: int = 0):
+    """Apply purchased/cast deltas to the user's vote balance for a poll"""
+    await db.vote_balances.update_one(
+        {"user_id": user_id, "poll_id": poll_id},
+        {
+            "$inc": {"purchased": purchased, "cast": cast, "available": purchased - cast},
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        },
+        upsert=True
+    )
+
+async def apply_order_to_vote_balance(user_id: str, poll_id: str, order_id: str, purchased: int = 0, cast: int = 0) -> bool:
+    """Apply a paid order's purchased or cast votes to the user's balance unless the order already did.
+    
+    The order id is recorded in the same write as the counts (purchased_orders or cast_orders),
+    so a step that failed can simply be run again. Returns whether this call applied it.
+    """
+    marker = "cast_orders" if cast else "purchased_orders"
+    query = {"user_id": user_id, "poll_id": poll_id, marker: {"$ne": order_id}}
+    update = {
+        "$inc": {"purchased": purchased, "cast": cast, "available": purchased - cast},
+        "$push": {marker: order_id},
+        "$set": {"updated_at": datetime.now(timezone.utc)}
+    }
+    try:
+        await db.vote_balances.update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        # The balance exists: either it already has this order, or it was created concurrently
+        result = await db.vote_balances.update_one(query, update)
+        return result.modified_count == 1
+    return True
+
+async def spend_votes(user_id: str, poll_id: str, vote_count: int) -> Optional[dict]:
+    """Atomically check and spend purchased votes. Returns the balance before spending, or None if insufficient"""
+    return await db.vote_balances.find_one_and_update(
+        {"user_id": user_id, "poll_id": poll_id, "available": {"$gte": vote_count}},
+        {
+            "$inc": {"cast": vote_count, "available": -vote_count},
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+
+async def rebuild_vote_balances():
+    """Build vote balances from transactions and votes for data that predates the ledger"""
+    balances = {}
+    def balance(row: dict) -> dict:
+        return balances.setdefault(
+            (row["_id"]["user_id"], row["_id"]["poll_id"]),
+            {"purchased": 0, "cast": 0, "purchased_orders": [], "cast_orders": []}
+        )
+    
+    async for row in db.transactions.aggregate([
+        {"$match": {"type": "purchase", "status": "success", "poll_id": {"$ne": None}}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "poll_id": "$poll_id"},
+            "total": {"$sum": "$vote_count"},
+            "orders": {"$push": "$cashfree_order_id"}
+        }}
+    ]):
+        counts = balance(row)
+        counts["purchased"] = row["total"]
+        counts["purchased_orders"] = [order_id for order_id in row["orders"] if order_id]
+    async for row in db.votes.aggregate([
+        {"$group": {
+            "_id": {"user_id": "$user_id", "poll_id": "$poll_id"},
+            "total": {"$sum": "$vote_count"},
+            "orders": {"$push": "$cashfree_order_id"}
+        }}
+    ]):
+        counts = balance(row)
+        counts["cast"] = row["total"]
+        counts["cast_orders"] = [order_id for order_id in row["orders"] if order_id]
+    
+    if balances:
+        now = datetime.now(timezone.utc)
+        await db.vote_balances.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "poll_id": poll_id},
+                {"$setOnInsert": {
+                    **counts,
+                    "available": counts["purchased"] - counts["cast"],
+                    "updated_at": now
+                }},
+                upsert=True
+            )
+            for (user_id, poll_id), counts in balances.items()
+        ], ordered=False)
+    return len(balances)
+
+async def compute_settlement_totals(poll_id: str, winning_option_id: str) -> dict:
+    """Sum winning votes and losing amount for a poll server-side"""
+    totals = {"winning_votes": 0, "losing_amount": 0}
+    async for row in db.votes.aggregate([
+        {"$match": {"poll_id": poll_id}},
+        {"$group": {
+            "_id": {"$eq": ["$option_id", winning_option_id]},
+            "votes": {"$sum": "$vote_count"},
+            "amount": {"$sum": "$amount_paid"}
+        }}
+    ]):
+        if row["_id"]:
+            totals["winning_votes"] = row["votes"]
+        else:
+            totals["losing_amount"] = row["amount"]
+    return totals
+
+async def credit_winnings_chunk(job_id: str, poll_id: str, winnings: List[tuple]):
+    """Credit one chunk of (user_id, amount) winnings idempotently.
+    
+    Wallets remember the last few settlement jobs applied to them and win transactions are
+    upserted per (poll, user), so replaying a chunk after a crash credits nobody twice.
+    """
+    now = datetime.now(timezone.utc)
+    await db.wallets.bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "applied_settlements": {"$ne": job_id}},
+            {
+                "$inc": {"balance": amount, "version": 1},
+                "$set": {"updated_at": now},
+                "$push": {"applied_settlements": {"$each": [job_id], "$slice": -20}}
+            }
+        )
+        for user_id, amount in winnings
+    ], ordered=True)
+    await db.user_poll_summary.bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "poll_id": poll_id},
+            {"$set": {"winning_amount": amount}}
+        )
+        for user_id, amount in winnings
+    ], ordered=False)
+    try:
+        await db.transactions.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "poll_id": poll_id, "type": "win"},
+                {"$setOnInsert": {
+                    "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
+                    "amount": amount,
+                    "status": "success",
+                    "created_at": now
+                }},
+                upsert=True
+            )
+            for user_id, amount in winnings
+        ], ordered=False)
+    except BulkWriteError as e:
+        # Another run inserted some of these win transactions first; the unique index kept one each
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+class SettlementLeaseLost(Exception):
+    """The job's lease expired and another run has claimed it"""
+
+async def claim_settlement_job(job_id: Optional[str] = None) -> Optional[dict]:
+    """Take the lease on a runnable settlement job (a specific one, or any stale one).
+    
+    The returned job carries the new lease_id; every later write by this run is conditional on it.
+    """
+    now = datetime.now(timezone.utc)
+    lease_id = uuid.uuid4().hex
+    query = {
+        "status": {"$in": ["pending", "running", "failed"]},
+        "attempts": {"$lt": SETTLEMENT_MAX_ATTEMPTS},
+        "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}]
+    }
+    if job_id:
+        query["job_id"] = job_id
+    job = await db.settlement_jobs.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "running",
+                "locked_by": WORKER_ID,
+                "lease_id": lease_id,
+                "locked_until": now + timedelta(seconds=SETTLEMENT_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if job:
+        job["lease_id"] = lease_id
+    return job
+
+async def renew_settlement_lease(job: dict):
+    """Extend this run's lease before a batch; raises SettlementLeaseLost if another run took over"""
+    now = datetime.now(timezone.utc)
+    result = await db.settlement_jobs.update_one(
+        {"job_id": job["job_id"], "lease_id": job["lease_id"]},
+        {"$set": {"locked_until": now + timedelta(seconds=SETTLEMENT_LEASE_SECONDS), "updated_at": now}}
+    )
+    if result.matched_count == 0:
+        raise SettlementLeaseLost()
+
+async def checkpoint_settlement_job(job: dict, poll_id: str, chunks: List[List[tuple]]):
+    """Credit a batch of chunks concurrently, then record how far the job has got"""
+    job_id = job["job_id"]
+    await renew_settlement_lease(job)
+    await asyncio.gather(*(credit_winnings_chunk(job_id, poll_id, chunk) for chunk in chunks))
+    now = datetime.now(timezone.utc)
+    # Progress only counts for the lease holder, so a run that lost its lease cannot count winners twice
+    result = await db.settlement_jobs.update_one(
+        {"job_id": job_id, "lease_id": job["lease_id"]},
+        {
+            "$set": {
+                "last_user_id": chunks[-1][-1][0],
+                "locked_until": now + timedelta(seconds=SETTLEMENT_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {
+                "winners_credited": sum(len(chunk) for chunk in chunks),
+                "amount_credited": sum(amount for chunk in chunks for _, amount in chunk)
+            }
+        }
+    )
+    if result.matched_count == 0:
+        raise SettlementLeaseLost()
+
+async def begin_settlement(job: dict) -> bool:
+    """Stop voting on the job's poll and record its result, unless the poll belongs to another job.
+    
+    The job is stored before the poll changes, so a run picked up by the sweeper finishes
+    this step for a request that crashed in between. Safe to repeat for the same job.
+    """
+    poll_id = job["poll_id"]
+    poll = await db.polls.find_one_and_update(
+        {"poll_id": poll_id, "status": "active"},
+        {
+            "$set": {"status": "settling", "result_option_id": job["winning_option_id"], "settlement_job_id": job["job_id"]},
+            "$inc": {"version": 1}
+        },
+        projection={"_id": 0, "poll_id": 1}
+    )
+    if not poll:
+        # Already past active: carry on only if this job is the one settling it
+        # (polls settled before settlement_job_id was recorded have none)
+        poll = await db.polls.find_one(
+            {"poll_id": poll_id, "status": {"$in": ["settling", "closed"]}, "settlement_job_id": {"$in": [job["job_id"], None]}},
+            {"_id": 0, "poll_id": 1}
+        )
+        if not poll:
+            return False
+    results_cache.invalidate(poll_id)
+    await db.user_poll_summary.update_many(
+        {"poll_id": poll_id, "poll_status": "active"},
+        {"$set": {"poll_status": "settling", "winning_option_id": job["winning_option_id"]}}
+    )
+    return True
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def cancel_settlement_job(job: dict, reason: str):
+    now = datetime.now(timezone.utc)
+    await db.settlement_jobs.update_one(
+        {"job_id": job["job_id"], "status": {"$ne": "completed"}},
+        {"$set": {"status": "cancelled", "error": reason, "locked_until": None, "updated_at": now}}
+    )
+
+async def run_settlement_job(job: dict):
+    """Distribute a poll's losing pool to its winners, resuming from the job's last checkpoint"""
+    job_id = job["job_id"]
+    poll_id = job["poll_id"]
+    winning_option_id = job["winning_option_id"]
+    
+    try:
+        if not await begin_settlement(job):
+            await cancel_settlement_job(job, "Poll was settled by another job")
+            logger.warning(f"Settlement {job_id} cancelled: poll {poll_id} was settled by another job")
+            return
+        
+        # The share is fixed the first time the job runs so a resumed job pays the same rate
+        per_vote_share = job.get("per_vote_share")
+        if per_vote_share is None:
+            totals = await compute_settlement_totals(poll_id, winning_option_id)
+            per_vote_share = totals["losing_amount"] / totals["winning_votes"] if totals["winning_votes"] > 0 else 0
+            winners = await db.votes.aggregate([
+                {"$match": {"poll_id": poll_id, "option_id": winning_option_id}},
+                {"$group": {"_id": "$user_id"}},
+                {"$count": "total"}
+            ], allowDiskUse=True).to_list(1)
+            await db.settlement_jobs.update_one(
+                {"job_id": job_id, "lease_id": job["lease_id"]},
+                {"$set": {
+                    "winning_votes": totals["winning_votes"],
+                    "losing_amount": totals["losing_amount"],
+                    "per_vote_share": per_vote_share,
+                    "total_winners": winners[0]["total"] if winners else 0,
+                    "started_at": datetime.now(timezone.utc)
+                }}
+            )
+        
+        if per_vote_share > 0:
+            # Winners are streamed in user_id order; last_user_id is the resume point
+            pipeline = [
+                {"$match": {"poll_id": poll_id, "option_id": winning_option_id}},
+                {"$group": {"_id": "$user_id", "votes": {"$sum": "$vote_count"}}},
+                {"$sort": {"_id": 1}}
+            ]
+            if job.get("last_user_id"):
+                pipeline.append({"$match": {"_id": {"$gt": job["last_user_id"]}}})
+            
+            batch = []
+            chunk = []
+            async for row in db.votes.aggregate(pipeline, allowDiskUse=True, batchSize=SETTLEMENT_CHUNK_SIZE):
+                chunk.append((row["_id"], row["votes"] * per_vote_share))
+                if len(chunk) >= SETTLEMENT_CHUNK_SIZE:
+                    batch.append(chunk)
+                    chunk = []
+                if len(batch) >= SETTLEMENT_WORKERS:
+                    await checkpoint_settlement_job(job, poll_id, batch)
+                    batch = []
+            if chunk:
+                batch.append(chunk)
+            if batch:
+                await checkpoint_settlement_job(job, poll_id, batch)
+        
+        now = datetime.now(timezone.utc)
+        await db.user_poll_summary.update_many(
+            {"poll_id": poll_id, f"options.{winning_option_id}": {"$exists": True}},
+            {"$set": {"poll_status": "closed", "result_status": "won", "updated_at": now}}
+        )
+        await db.user_poll_summary.update_many(
+            {"poll_id": poll_id, f"options.{winning_option_id}": {"$exists": False}},
+            {"$set": {"poll_status": "closed", "result_status": "lost", "updated_at": now}}
+        )
+        await db.polls.update_one(
+            {"poll_id": poll_id, "status": "settling"},
+            {"$set": {"status": "closed", "closed_at": now}, "$inc": {"version": 1}}
+        )
+        results_cache.invalidate(poll_id)
+        await db.settlement_jobs.update_one(
+            {"job_id": job_id, "lease_id": job["lease_id"]},
+            {"$set": {"status": "completed", "locked_until": None, "completed_at": now, "updated_at": now}}
+        )
+        logger.info(f"Settlement {job_id} completed for poll {poll_id}")
+    except SettlementLeaseLost:
+        logger.warning(f"Settlement {job_id} lease was taken over by another run; stopping this one")
+    except Exception as e:
+        logger.error(f"Settlement {job_id} failed: {e}")
+        await db.settlement_jobs.update_one(
+            {"job_id": job_id, "lease_id": job["lease_id"]},
+            {"$set": {"status": "failed", "error": str(e), "locked_until": None, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+async def settlement_sweeper():
+    """Periodically pick up settlement jobs abandoned by a crashed or restarted worker"""
+    while True:
+        try:
+            job = await claim_settlement_job()
+            while job:
+                await run_settlement_job(job)
+                job = await claim_settlement_job()
+        except Exception as e:
+            logger.error(f"Settlement sweeper error: {e}")
+        await asyncio.sleep(SETTLEMENT_SWEEP_INTERVAL)
+
+# Set whenever an event lands in the webhook inbox so idle consumers pick it up at once
+webhook_wakeup = asyncio.Event()
+webhook_stats = {"received": 0, "duplicates": 0, "processed": 0, "retried": 0, "dead": 0}
+
+async def handle_webhook_event(payload: dict):
+    """Apply one Cashfree webhook; safe to run again for the same event"""
+    event_type = payload.get("type")
+    order_id = payload.get("data", {}).get("order", {}).get("order_id")
+    
+    logger.info(f"Webhook received: {event_type} for order {order_id}")
+    
+    if event_type == "PAYMENT_SUCCESS_WEBHOOK":
+        # The credit is applied once per order however often it runs, so a retry after a
+        # failed credit finishes it even though the transaction is already marked paid
+        transaction = await db.transactions.find_one_and_update(
+            {"cashfree_order_id": order_id},
+            {"$set": {"status": "success"}}
+        )
+        if transaction:
+            if transaction.get("type") == "purchase" and transaction.get("poll_id"):
+                await apply_order_to_vote_balance(
+                    transaction["user_id"],
+                    transaction["poll_id"],
+                    order_id,
+                    purchased=transaction.get("vote_count", 0)
+                )
+            
+            logger.info(f"Payment processed successfully: {order_id}")
+
+async def claim_webhook_event() -> Optional[dict]:
+    """Take the oldest due inbox event (returned as it was before the claim).
+    
+    The claim's expiry doubles as the event's retry time if the consumer dies.
+    """
+    now = datetime.now(timezone.utc)
+    return await db.webhook_inbox.find_one_and_update(
+        {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": "processing",
+                "locked_by": WORKER_ID,
+                "next_attempt_at": now + timedelta(seconds=WEBHOOK_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        projection={"_id": 0},
+        sort=[("next_attempt_at", ASCENDING)],
+        return_document=ReturnDocument.BEFORE
+    )
+
+async def process_webhook_event(event: dict):
+    """Run a claimed event, then mark it done, schedule a retry with backoff, or dead-letter it"""
+    event_id = event["event_id"]
+    attempts = event["attempts"] + 1
+    try:
+        if attempts > WEBHOOK_MAX_ATTEMPTS:
+            raise RuntimeError("Consumer stopped while processing this event on every attempt")
+        await handle_webhook_event(json.loads(event["payload"]))
+    except Exception as e:
+        now = datetime.now(timezone.utc)
+        # A payload that is not JSON will never parse, so it is not worth retrying
+        dead = isinstance(e, json.JSONDecodeError) or attempts >= WEBHOOK_MAX_ATTEMPTS
+        update = {"status": "dead" if dead else "pending", "error": str(e), "locked_by": None, "updated_at": now}
+        if not dead:
+            delay = min(WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), WEBHOOK_RETRY_MAX_SECONDS)
+            update["next_attempt_at"] = now + timedelta(seconds=delay)
+        await db.webhook_inbox.update_one({"event_id": event_id, "status": "processing"}, {"$set": update})
+        webhook_stats["dead" if dead else "retried"] += 1
+        logger.error(f"Webhook {event_id} attempt {attempts} failed{' (dead-lettered)' if dead else ''}: {e}")
+        return
+    
+    now = datetime.now(timezone.utc)
+    await db.webhook_inbox.update_one(
+        {"event_id": event_id, "status": "processing"},
+        {"$set": {
+            "status": "done",
+            "error": None,
+            "locked_by": None,
+            "processed_at": now,
+            "expires_at": now + timedelta(days=WEBHOOK_RETENTION_DAYS),
+            "updated_at": now
+        }}
+    )
+    webhook_stats["processed"] += 1
+
+async def webhook_consumer():
+    """Work through due inbox events, waking early when the webhook endpoint stores a new one"""
+    while True:
+        webhook_wakeup.clear()
+        try:
+            event = await claim_webhook_event()
+            while event:
+                await process_webhook_event(event)
+                event = await claim_webhook_event()
+        except Exception as e:
+            logger.error(f"Webhook consumer error: {e}")
+        try:
+            await asyncio.wait_for(webhook_wakeup.wait(), WEBHOOK_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def compute_analytics() -> dict:
+    """Dashboard counters, one aggregation per collection, run concurrently"""
+    async def first(cursor) -> dict:
+        rows = await cursor.to_list(1)
+        return rows[0] if rows else {}
+    
+    users, polls, withdrawals, revenue = await asyncio.gather(
+        first(db.users.aggregate([
+            {"$match": {"is_deleted": {"$ne": True}}},
+            {"$count": "total"}
+        ])),
+        first(db.polls.aggregate([
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "active": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}},
+                "closed": {"$sum": {"$cond": [{"$eq": ["$status", "closed"]}, 1, 0]}}
+            }}
+        ])),
+        first(db.withdrawals.aggregate([
+            {"$match": {"status": "pending"}},
+            {"$count": "total"}
+        ])),
+        first(db.transactions.aggregate([
+            {"$match": {"status": "success", "type": "purchase"}},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+        ]))
+    )
+    
+    return {
+        "total_users": users.get("total", 0),
+        "total_polls": polls.get("total", 0),
+        "active_polls": polls.get("active", 0),
+        "closed_polls": polls.get("closed", 0),
+        "pending_withdrawals": withdrawals.get("total", 0),
+        "total_revenue": revenue.get("total", 0),
+        "as_of": datetime.now(timezone.utc)
+    }
+
+analytics_snapshot: Dict[str, Any] = {}
+
+async def refresh_analytics_snapshot() -> dict:
+    snapshot = await compute_analytics()
+    analytics_snapshot.update(snapshot)
+    return snapshot
+
+async def analytics_refresher():
+    """Recompute the dashboard snapshot in the background so page loads never hit the database"""
+    while True:
+        try:
+            await refresh_analytics_snapshot()
+        except Exception as e:
+            logger.error(f"Analytics refresh error: {e}")
+        await asyncio.sleep(ANALYTICS_REFRESH_INTERVAL)
+
+def process_image(data: bytes, thumbnail_size: int) -> tuple:
+    """Validate an uploaded image and render its thumbnail. Runs in the image process pool.
+    
+    Returns (content_type, thumbnail_bytes, thumbnail_content_type).
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img.verify()
+    with Image.open(io.BytesIO(data)) as img:
+        content_type = Image.MIME.get(img.format, "application/octet-stream")
+        img.thumbnail((thumbnail_size, thumbnail_size))
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        out = io.BytesIO()
+        if has_alpha:
+            img.save(out, format="PNG", optimize=True)
+            return content_type, out.getvalue(), "image/png"
+        img.convert("RGB").save(out, format="JPEG", quality=85, optimize=True)
+        return content_type, out.getvalue(), "image/jpeg"
+
+class GridFSImageStore:
+    def __init__(self, database):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name="images")
+    
+    async def put(self, image_hash: str, data: bytes, content_type: str):
+        await self.bucket.upload_from_stream(image_hash, data, metadata={"content_type": content_type})
+    
+    async def get(self, image_hash: str) -> Optional[bytes]:
+        try:
+            stream = await self.bucket.open_download_stream_by_name(image_hash)
+        except NoFile:
+            return None
+        return await stream.read()
+
+class LocalImageStore:
+    def __init__(self, directory: Path):
+        self.directory = directory
+    
+    def path(self, image_hash: str) -> Path:
+        return self.directory / image_hash[:2] / image_hash
+    
+    def write(self, image_hash: str, data: bytes):
+        path = self.path(image_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial blob
+        tmp = path.with_name(f"{image_hash}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    
+    def read(self, image_hash: str) -> Optional[bytes]:
+        try:
+            return self.path(image_hash).read_bytes()
+        except FileNotFoundError:
+            return None
+    
+    async def put(self, image_hash: str, data: bytes, content_type: str):
+        await asyncio.to_thread(self.write, image_hash, data)
+    
+    async def get(self, image_hash: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.read, image_hash)
+
+image_store = LocalImageStore(IMAGE_STORE_DIR) if IMAGE_STORE == "local" else GridFSImageStore(db)
+
+IMAGE_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+def image_url(image_hash: str) -> str:
+    return f"/api/images/{image_hash}"
+
+async def store_image(data: bytes) -> dict:
+    """Store an image and its thumbnail by content hash; uploading the same bytes again is a no-op"""
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image is larger than {IMAGE_MAX_BYTES} bytes"
+        )
+    image_hash = hashlib.sha256(data).hexdigest()
+    image = await db.images.find_one({"hash": image_hash}, {"_id": 0})
+    if not image:
+        try:
+            content_type, thumbnail, thumbnail_type = await asyncio.get_running_loop().run_in_executor(
+                image_executor, process_image, data, IMAGE_THUMBNAIL_SIZE
+            )
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+            # DecompressionBombError is not an OSError: it is raised for images with far too many pixels
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image")
+        thumbnail_hash = hashlib.sha256(thumbnail).hexdigest()
+        await image_store.put(image_hash, data, content_type)
+        await image_store.put(thumbnail_hash, thumbnail, thumbnail_type)
+        now = datetime.now(timezone.utc)
+        await db.images.bulk_write([
+            UpdateOne(
+                {"hash": thumbnail_hash},
+                {"$setOnInsert": {"content_type": thumbnail_type, "size": len(thumbnail), "created_at": now}},
+                upsert=True
+            ),
+            UpdateOne(
+                {"hash": image_hash},
+                {"$set": {"thumbnail_hash": thumbnail_hash}, "$setOnInsert": {"content_type": content_type, "size": len(data), "created_at": now}},
+                upsert=True
+            )
+        ], ordered=True)
+        image = {"hash": image_hash, "thumbnail_hash": thumbnail_hash}
+    return {
+        "image_url": image_url(image["hash"]),
+        "thumbnail_url": image_url(image.get("thumbnail_hash", image["hash"]))
+    }
+
+async def build_poll_option(opt: dict) -> dict:
+    """Turn a CreatePoll option into a stored option, moving any inline image into the image store"""
+    option = {
+        "option_id": f"opt_{uuid.uuid4().hex[:8]}",
+        "text": opt["text"],
+        "image_url": opt.get("image_url"),
+        "thumbnail_url": opt.get("thumbnail_url") or opt.get("image_url")
+    }
+    if opt.get("image_base64"):
+        encoded = opt["image_base64"]
+        if encoded.startswith("data:"):
+            encoded = encoded.split(",", 1)[-1]
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image encoding")
+        option.update(await store_image(data))
+    return option
+
+async def claim_inline_image_poll() -> Optional[dict]:
+    """Claim a poll that still has inline images, so workers starting together each migrate different polls"""
+    now = datetime.now(timezone.utc)
+    return await db.polls.find_one_and_update(
+        {
+            "options.image_base64": {"$exists": True},
+            "$or": [
+                {"image_migration_until": {"$exists": False}},
+                {"image_migration_until": {"$lt": now}}
+            ]
+        },
+        {"$set": {"image_migration_until": now + timedelta(seconds=IMAGE_MIGRATION_LEASE_SECONDS)}},
+        projection={"_id": 0, "poll_id": 1, "options": 1}
+    )
+
+async def migrate_inline_images() -> int:
+    """Move image_base64 options still stored inside poll documents into the image store"""
+    migrated = 0
+    while (poll := await claim_inline_image_poll()) is not None:
+        options = []
+        for opt in poll["options"]:
+            opt = dict(opt)
+            encoded = opt.pop("image_base64", None)
+            if encoded:
+                try:
+                    if encoded.startswith("data:"):
+                        encoded = encoded.split(",", 1)[-1]
+                    opt.update(await store_image(base64.b64decode(encoded)))
+                except (HTTPException, ValueError) as e:
+                    logger.warning(f"Dropping unreadable image on {poll['poll_id']}/{opt['option_id']}: {e}")
+            options.append(opt)
+        await db.polls.update_one(
+            {"poll_id": poll["poll_id"]},
+            {"$set": {"options": options}, "$unset": {"image_migration_until": ""}, "$inc": {"version": 1}}
+        )
+        migrated += 1
+    return migrated
+
+UPSTREAM_HOSTS = {
+    "cashfree": CASHFREE_BASE_URL,
+    "emergent_auth": EMERGENT_AUTH_BASE_URL
+}
+
+http_clients: Dict[str, httpx.AsyncClient] = {}
+http_client_stats: Dict[str, dict] = {}
+
+def create_http_client(base_url: str) -> httpx.AsyncClient:
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP2_ENABLED is set but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_READ_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT
+        )
+    )
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Shared client for an upstream; created lazily if used before startup ran"""
+    if name not in http_clients:
+        http_clients[name] = create_http_client(UPSTREAM_HOSTS[name])
+        http_client_stats[name] = {"in_flight": 0, "requests": 0, "errors": 0, "total_latency_ms": 0.0}
+    return http_clients[name]
+
+async def upstream_request(name: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request through the shared client for an upstream, recording pool metrics"""
+    client = get_http_client(name)
+    stats = http_client_stats[name]
+    stats["in_flight"] += 1
+    started = time.monotonic()
+    try:
+        return await client.request(method, url, **kwargs)
+    except Exception:
+        stats["errors"] += 1
+        raise
+    finally:
+        stats["in_flight"] -= 1
+        stats["requests"] += 1
+        stats["total_latency_ms"] += (time.monotonic() - started) * 1000
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Circuit for {name} is open")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures, then let one probe through to test it.
+    
+    closed: calls go through, consecutive failures are counted.
+    open: calls fail at once with CircuitOpenError until reset_seconds have passed.
+    half_open: a single probe call goes through; success closes the circuit, failure reopens it.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+        self.rejected = 0
+    
+    def retry_after(self) -> int:
+        return max(1, int(self.reset_seconds - (time.monotonic() - self.opened_at) + 0.999))
+    
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+    
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+    
+    async def call(self, fn, *args, **kwargs):
+        """Run fn unless the circuit is open; any exception it raises counts as a failure"""
+        if not self.allow():
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # The caller went away; that says nothing about the upstream
+            self.probing = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+    
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+cashfree_breaker = CircuitBreaker("cashfree", CASHFREE_BREAKER_FAILURES, CASHFREE_BREAKER_RESET_SECONDS)
+
+def http_pool_metrics() -> dict:
+    metrics = {}
+    for name, client in http_clients.items():
+        stats = http_client_stats[name]
+        # httpx doesn't expose pool state publicly; read it from the httpcore pool when present
+        connections = getattr(getattr(client._transport, "_pool", None), "connections", [])
+        metrics[name] = {
+            "base_url": str(client.base_url),
+            "max_connections": HTTP_MAX_CONNECTIONS_PER_HOST,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "in_flight": stats["in_flight"],
+            "requests": stats["requests"],
+            "errors": stats["errors"],
+            "avg_latency_ms": round(stats["total_latency_ms"] / stats["requests"], 1) if stats["requests"] else 0.0
+        }
+    return metrics
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the client's If-None-Match already names this representation"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": cache_control})
+
+# Poll list endpoints return this summary unless the caller asks for other fields
+POLL_SUMMARY_FIELDS = [
+    "poll_id", "title", "description", "price_per_vote", "status", "result_option_id",
+    "option_count", "total_votes", "total_amount", "voter_count", "created_at"
+]
+POLL_FIELDS = set(POLL_SUMMARY_FIELDS) | {"options", "tallies", "closed_at"}
+FIELD_PATH_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+def poll_projection(fields: Optional[str]) -> dict:
+    """Map a comma-separated fields= parameter onto a Mongo projection over poll documents.
+    
+    Nested paths such as options.text are allowed. poll_id and created_at are always
+    returned because list pagination is keyed on them.
+    """
+    names = POLL_SUMMARY_FIELDS
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [
+            name for name in names
+            if not FIELD_PATH_PATTERN.match(name) or name.split(".", 1)[0] not in POLL_FIELDS
+        ]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+    paths = set(names) | {"poll_id", "created_at"}
+    # Mongo rejects a projection holding both a path and one of its parents
+    paths = {path for path in paths if not any(path.startswith(f"{other}.") for other in paths)}
+    return {"_id": 0, **{path: 1 for path in sorted(paths)}}
+
+def encode_cursor(doc: dict, id_field: str) -> str:
+    """Opaque cursor pointing just past doc in (created_at desc, id desc) order"""
+    created_at = doc["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps({"t": created_at, "id": doc[id_field]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {"created_at": datetime.fromisoformat(data["t"]), "id": data["id"]}
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def after_cursor(query: dict, id_field: str, cursor: Optional[str]) -> dict:
+    """Narrow a (created_at desc, id desc) listing's query to the rows after the cursor"""
+    if not cursor:
+        return query
+    position = decode_cursor(cursor)
+    return {
+        **query,
+        "$or": [
+            {"created_at": {"$lt": position["created_at"]}},
+            {"created_at": position["created_at"], id_field: {"$lt": position["id"]}}
+        ]
+    }
+
+async def paginate(collection, query: dict, id_field: str, limit: int, cursor: Optional[str], response: Response, projection: Optional[dict] = None) -> List[dict]:
+    """Return one page of a (created_at desc, id desc) listing, setting X-Next-Cursor when there is more.
+    
+    Seeks from the cursor instead of skipping, so every page costs the same however deep it is.
+    """
+    query = after_cursor(query, id_field, cursor)
+    items = await collection.find(query, projection or {"_id": 0}).sort(
+        [("created_at", DESCENDING), (id_field, DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(items[-1], id_field)
+    return items
+
+async def load_participation(user_id: str) -> List[dict]:
+    """Load a user's poll history in three queries: their votes, the polls ($in) and win transactions ($in)"""
+    votes_by_poll = {}
+    async for vote in db.votes.find(
+        {"user_id": user_id},
+        {"_id": 0, "poll_id": 1, "option_id": 1, "vote_count": 1, "amount_paid": 1}
+    ):
+        votes_by_poll.setdefault(vote["poll_id"], []).append(vote)
+    if not votes_by_poll:
+        return []
+    
+    polls = {}
+    async for poll in db.polls.find(
+        {"poll_id": {"$in": list(votes_by_poll)}},
+        {"_id": 0, "tallies": 0}
+    ):
+        polls[poll["poll_id"]] = poll
+    
+    won_poll_ids = {
+        poll_id for poll_id, poll in polls.items()
+        if poll.get("result_option_id") and any(v["option_id"] == poll["result_option_id"] for v in votes_by_poll[poll_id])
+    }
+    winnings = {}
+    if won_poll_ids:
+        async for txn in db.transactions.find(
+            {"user_id": user_id, "poll_id": {"$in": list(won_poll_ids)}, "type": "win"},
+            {"_id": 0, "poll_id": 1, "amount": 1}
+        ):
+            winnings.setdefault(txn["poll_id"], txn["amount"])
+    
+    participation = []
+    for poll_id, votes in votes_by_poll.items():
+        poll = polls.get(poll_id)
+        if not poll:
+            continue
+        option_text = {opt["option_id"]: opt["text"] for opt in poll["options"]}
+        participation.append({
+            "poll": poll,
+            "votes": votes,
+            "total_votes": sum(v["vote_count"] for v in votes),
+            "total_spent": sum(v["amount_paid"] for v in votes),
+            "voted_options": [
+                {
+                    "option_id": v["option_id"],
+                    "option_text": option_text.get(v["option_id"], "Unknown"),
+                    "vote_count": v["vote_count"],
+                    "amount": v["amount_paid"]
+                }
+                for v in votes
+            ],
+            "user_won": poll_id in won_poll_ids,
+            "winning_amount": winnings.get(poll_id, 0)
+        })
+    return participation
+
+background_tasks = set()
+
+def spawn_background(coro):
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)):
     to_encode = data.copy()
@@ -326,8 +2118,8 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(request: Request) -> Optional[User]:
-    """Get current user from session token (cookie or Authorization header)"""
+def get_session_token(request: Request) -> Optional[str]:
+    """Read the user session token from the cookie or Authorization header"""
     session_token = request.cookies.get("session_token")
     
     if not session_token:
@@ -335,9 +2127,30 @@ async def get_current_user(request: Request) -> Optional[User]:
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header.replace("Bearer ", "")
     
+    return session_token
+
+async def get_current_user(request: Request) -> Optional[User]:
+    """Get current user from session token (cookie or Authorization header)"""
+    session_token = get_session_token(request)
+    
     if not session_token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     
+    # Signed sessions are verified locally with no database round trip
+    if is_signed_session_token(session_token):
+        payload = decode_signed_session_token(session_token)
+        if session_revocations.is_revoked(payload["jti"], payload["user_id"], payload["iat"]):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+        return User(**{field: payload.get(field) for field in User.model_fields})
+    
+    cached = session_cache.get(session_token)
+    if cached:
+        user, expires_at = cached
+        if expires_at < datetime.now(timezone.utc):
+            session_cache.pop(session_token)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired")
+        return user
+    
     session = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
     if not session:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
@@ -354,7 +2167,10 @@ async def get_current_user(request: Request) -> Optional[User]:
     if not user_doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+    session_cache.set(session_token, (user, expires_at), ttl=remaining)
+    return user
 
 async def get_current_admin(request: Request) -> Optional[Admin]:
     """Get current admin from JWT token"""
@@ -379,6 +2195,260 @@ async def get_current_admin(request: Request) -> Optional[Admin]:
     
     return Admin(**admin_doc)
 
+# ============= INDEXES =============
+
+def index(keys, **options) -> IndexModel:
+    """Index with a stable name derived from its keys so re-creating it is a no-op"""
+    keys = [(k, ASCENDING) if isinstance(k, str) else k for k in keys]
+    options.setdefault("name", "_".join(f"{field}_{direction}" for field, direction in keys))
+    return IndexModel(keys, **options)
+
+# Every index the server relies on, applied idempotently at startup
+INDEXES = {
+    "users": [
+        index(["user_id"], unique=True),
+        index(["email"], unique=True),
+        index([("created_at", DESCENDING), ("user_id", DESCENDING)])
+    ],
+    "admins": [
+        index(["admin_id"], unique=True),
+        index(["email"], unique=True)
+    ],
+    "user_sessions": [
+        index(["session_token"]),
+        index(["user_id"]),
+        index(["expires_at"], expireAfterSeconds=0)
+    ],
+    "images": [
+        index(["hash"], unique=True)
+    ],
+    "session_revocations": [
+        index(["created_at"]),
+        index(["expires_at"], expireAfterSeconds=0)
+    ],
+    "polls": [
+        index(["poll_id"], unique=True),
+        index(["status", ("created_at", DESCENDING)]),
+        index(["status", "poll_id", "version", "counter_shards"]),
+        index([("created_at", DESCENDING), ("poll_id", DESCENDING)])
+    ],
+    "votes": [
+        index(["poll_id", "option_id", "user_id"]),
+        index(["user_id", "poll_id"]),
+        index(["cashfree_order_id"], unique=True, sparse=True, name="cashfree_order_id_unique"),
+        index(["created_at"])
+    ],
+    "poll_counter_shards": [
+        index(["poll_id", "shard"], unique=True)
+    ],
+    "user_poll_summary": [
+        index(["user_id", "poll_id"], unique=True),
+        index(["user_id", ("created_at", DESCENDING)]),
+        index(["poll_id", "user_id"]),
+        index(["poll_id", ("created_at", DESCENDING), ("user_id", DESCENDING)])
+    ],
+    "vote_balances": [
+        index(["user_id", "poll_id"], unique=True)
+    ],
+    "wallets": [
+        index(["user_id"], unique=True)
+    ],
+    "transactions": [
+        index(["transaction_id"], unique=True),
+        index(["cashfree_order_id"], unique=True, sparse=True, name="cashfree_order_id_unique"),
+        index(["user_id", ("created_at", DESCENDING), ("transaction_id", DESCENDING)]),
+        index(["user_id", "poll_id", "type", "status"]),
+        # One win transaction per user and poll, even if two runs of a settlement overlap
+        index(["user_id", "poll_id"], unique=True, partialFilterExpression={"type": "win"}, name="user_id_1_poll_id_1_win_unique"),
+        index(["poll_id", "type"]),
+        index(["type", "status"]),
+        index([("created_at", DESCENDING), ("transaction_id", DESCENDING)])
+    ],
+    "withdrawals": [
+        index(["withdrawal_id"], unique=True),
+        index(["user_id", ("created_at", DESCENDING), ("withdrawal_id", DESCENDING)]),
+        index(["status", ("created_at", DESCENDING), ("withdrawal_id", DESCENDING)]),
+        index([("created_at", DESCENDING), ("withdrawal_id", DESCENDING)])
+    ],
+    "settlement_jobs": [
+        index(["job_id"], unique=True),
+        index(["status", "locked_until"]),
+        index(["status", ("created_at", DESCENDING), ("job_id", DESCENDING)]),
+        index([("created_at", DESCENDING), ("job_id", DESCENDING)])
+    ],
+    "webhook_inbox": [
+        index(["event_id"], unique=True),
+        index(["status", "next_attempt_at"]),
+        index(["status", ("created_at", DESCENDING), ("event_id", DESCENDING)]),
+        index(["expires_at"], expireAfterSeconds=0)
+    ]
+}
+
+# Indexes superseded by ones in INDEXES, dropped once their replacement exists
+OBSOLETE_INDEXES = {
+    "votes": ["cashfree_order_id_1"],
+    "transactions": ["cashfree_order_id_1"],
+    "withdrawals": ["status_1"]
+}
+
+async def ensure_indexes() -> List[str]:
+    """Create any missing indexes. Conflicts with existing indexes are logged, not fatal"""
+    # Non-Cashfree transactions used to store an explicit null order id, which a unique
+    # sparse index would treat as duplicates
+    await db.transactions.update_many(
+        {"cashfree_order_id": {"$in": [None], "$exists": True}},
+        {"$unset": {"cashfree_order_id": ""}}
+    )
+    
+    created = []
+    for collection, models in INDEXES.items():
+        failed = False
+        # One at a time, so an index that conflicts with existing data doesn't hold back the rest
+        for model in models:
+            try:
+                created.extend(await db[collection].create_indexes([model]))
+            except OperationFailure as e:
+                logger.error(f"Could not create index {model.document['name']} on {collection}: {e}")
+                failed = True
+        if failed:
+            continue
+        existing = await db[collection].index_information()
+        for name in OBSOLETE_INDEXES.get(collection, []):
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped superseded index {collection}.{name}")
+    return created
+
+def sample_time() -> datetime:
+    return datetime.now(timezone.utc)
+
+# Representative shape of every query the server issues, for the explain() audit
+QUERY_SHAPES = [
+    {"name": "user by email", "collection": "users", "filter": {"email": "x"}},
+    {"name": "user by id", "collection": "users", "filter": {"user_id": "x"}},
+    {"name": "admin by email", "collection": "admins", "filter": {"email": "x"}},
+    {"name": "admin by id", "collection": "admins", "filter": {"admin_id": "x"}},
+    {"name": "session by token", "collection": "user_sessions", "filter": {"session_token": "x"}},
+    {"name": "sessions by user", "collection": "user_sessions", "filter": {"user_id": "x"}},
+    {"name": "recent revocations", "collection": "session_revocations", "filter": {"expires_at": {"$gt": sample_time}, "created_at": {"$gte": sample_time}}},
+    {"name": "poll by id", "collection": "polls", "filter": {"poll_id": "x"}},
+    {"name": "active polls", "collection": "polls", "filter": {"status": "active"}},
+    {"name": "active poll versions", "collection": "polls", "filter": {"status": "active"}, "projection": {"_id": 0, "poll_id": 1, "version": 1, "counter_shards": 1}, "sort": {"poll_id": 1}},
+    {"name": "poll counter shards", "collection": "poll_counter_shards", "filter": {"poll_id": {"$in": ["x"]}}},
+    {"name": "all polls by date", "collection": "polls", "filter": {}, "sort": {"created_at": -1, "poll_id": -1}},
+    {"name": "all users by date", "collection": "users", "filter": {}, "sort": {"created_at": -1, "user_id": -1}},
+    {"name": "votes by poll", "collection": "votes", "filter": {"poll_id": "x"}},
+    {"name": "votes by user", "collection": "votes", "filter": {"user_id": "x"}},
+    {"name": "votes by user and poll", "collection": "votes", "filter": {"poll_id": "x", "user_id": "x"}},
+    {"name": "vote by order", "collection": "votes", "filter": {"cashfree_order_id": "x"}},
+    {"name": "settlement totals", "collection": "votes", "pipeline": [
+        {"$match": {"poll_id": "x"}},
+        {"$group": {"_id": {"$eq": ["$option_id", "x"]}, "votes": {"$sum": "$vote_count"}}}
+    ]},
+    {"name": "settlement winners", "collection": "votes", "pipeline": [
+        {"$match": {"poll_id": "x", "option_id": "x"}},
+        {"$group": {"_id": "$user_id", "votes": {"$sum": "$vote_count"}}}
+    ]},
+    {"name": "user poll summary", "collection": "user_poll_summary", "filter": {"user_id": "x", "poll_id": "x"}},
+    {"name": "user poll history", "collection": "user_poll_summary", "filter": {"user_id": "x"}, "sort": {"created_at": -1}},
+    {"name": "poll summaries", "collection": "user_poll_summary", "filter": {"poll_id": "x", "options.x": {"$exists": True}}},
+    {"name": "poll voters page", "collection": "user_poll_summary", "pipeline": [
+        {"$match": {"poll_id": "x", "$or": [
+            {"created_at": {"$lt": sample_time}},
+            {"created_at": sample_time, "user_id": {"$lt": "x"}}
+        ]}},
+        {"$sort": {"created_at": -1, "user_id": -1}},
+        {"$limit": 101}
+    ]},
+    {"name": "poll voter breakdown", "collection": "user_poll_summary", "pipeline": [
+        {"$match": {"poll_id": "x"}},
+        {"$group": {"_id": "$result_status", "count": {"$sum": 1}}}
+    ]},
+    {"name": "vote balance", "collection": "vote_balances", "filter": {"user_id": "x", "poll_id": "x", "available": {"$gte": 1}}},
+    {"name": "wallet by user", "collection": "wallets", "filter": {"user_id": "x"}},
+    {"name": "transactions by user", "collection": "transactions", "filter": {"user_id": "x"}, "sort": {"created_at": -1, "transaction_id": -1}},
+    {"name": "transactions by user after cursor", "collection": "transactions", "filter": {"user_id": "x", "$or": [
+        {"created_at": {"$lt": sample_time}},
+        {"created_at": sample_time, "transaction_id": {"$lt": "x"}}
+    ]}, "sort": {"created_at": -1, "transaction_id": -1}},
+    {"name": "transaction totals by user", "collection": "transactions", "pipeline": [
+        {"$match": {"user_id": "x"}},
+        {"$group": {"_id": "$type", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}}
+    ]},
+    {"name": "transaction by order", "collection": "transactions", "filter": {"cashfree_order_id": "x", "type": "purchase"}},
+    {"name": "win transaction", "collection": "transactions", "filter": {"user_id": "x", "poll_id": "x", "type": "win"}},
+    {"name": "win transactions for polls", "collection": "transactions", "filter": {"user_id": "x", "poll_id": {"$in": ["x", "y"]}, "type": "win"}},
+    {"name": "polls by ids", "collection": "polls", "filter": {"poll_id": {"$in": ["x", "y"]}}},
+    {"name": "transactions by poll", "collection": "transactions", "filter": {"poll_id": "x"}},
+    {"name": "all transactions by date", "collection": "transactions", "filter": {}, "sort": {"created_at": -1, "transaction_id": -1}},
+    {"name": "revenue", "collection": "transactions", "pipeline": [
+        {"$match": {"status": "success", "type": "purchase"}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+    ]},
+    {"name": "withdrawal by id", "collection": "withdrawals", "filter": {"withdrawal_id": "x"}},
+    {"name": "withdrawals by user", "collection": "withdrawals", "filter": {"user_id": "x"}, "sort": {"created_at": -1, "withdrawal_id": -1}},
+    {"name": "pending withdrawals", "collection": "withdrawals", "filter": {"status": "pending"}, "sort": {"created_at": -1, "withdrawal_id": -1}},
+    {"name": "vote export by date", "collection": "votes", "filter": {"created_at": {"$gte": sample_time}}, "sort": {"created_at": 1}},
+    {"name": "transaction export by date and type", "collection": "transactions", "filter": {"created_at": {"$gte": sample_time}, "type": "purchase"}, "sort": {"created_at": 1}},
+    {"name": "all withdrawals by date", "collection": "withdrawals", "filter": {}, "sort": {"created_at": -1, "withdrawal_id": -1}},
+    {"name": "settlement job", "collection": "settlement_jobs", "filter": {"job_id": "x"}},
+    {"name": "failed settlement jobs", "collection": "settlement_jobs", "filter": {"status": "failed"}, "sort": {"created_at": -1, "job_id": -1}},
+    {"name": "all settlement jobs by date", "collection": "settlement_jobs", "filter": {}, "sort": {"created_at": -1, "job_id": -1}},
+    {"name": "claimable settlement jobs", "collection": "settlement_jobs", "filter": {"status": {"$in": ["pending", "running", "failed"]}, "locked_until": None}},
+    {"name": "due webhook events", "collection": "webhook_inbox", "filter": {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": sample_time}}, "sort": {"next_attempt_at": 1}},
+    {"name": "dead webhook events", "collection": "webhook_inbox", "filter": {"status": "dead"}, "sort": {"created_at": -1, "event_id": -1}}
+]
+
+def plan_stages(node) -> List[str]:
+    """All stage names in an explain() winning plan"""
+    stages = []
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage" and isinstance(value, str):
+                stages.append(value)
+            else:
+                stages.extend(plan_stages(value))
+    elif isinstance(node, list):
+        for item in node:
+            stages.extend(plan_stages(item))
+    return stages
+
+def resolve_sample_values(value):
+    if callable(value):
+        return value()
+    if isinstance(value, dict):
+        return {k: resolve_sample_values(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_sample_values(v) for v in value]
+    return value
+
+async def audit_query_plans() -> List[dict]:
+    """Explain every registered query shape and flag the ones that scan a whole collection"""
+    results = []
+    for shape in QUERY_SHAPES:
+        if "pipeline" in shape:
+            command = {"aggregate": shape["collection"], "pipeline": resolve_sample_values(shape["pipeline"]), "cursor": {}}
+        else:
+            command = {"find": shape["collection"], "filter": resolve_sample_values(shape["filter"])}
+            if shape.get("sort"):
+                command["sort"] = shape["sort"]
+            if shape.get("projection"):
+                command["projection"] = shape["projection"]
+        try:
+            explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+            stages = plan_stages(explain)
+            results.append({
+                "name": shape["name"],
+                "collection": shape["collection"],
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages
+            })
+        except Exception as e:
+            results.append({"name": shape["name"], "collection": shape["collection"], "error": str(e)})
+    return results
+
 # ============= AUTH ROUTES =============
 
 @api_router.post("/auth/register")
@@ -394,7 +2464,7 @@ async def user_register(user_data: UserRegister, response: Response):
         "user_id": user_id,
         "email": user_data.email,
         "name": user_data.name,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(user_data.password),
         "picture": None,
         "upi_id": None,
         "created_at": datetime.now(timezone.utc)
@@ -410,26 +2480,8 @@ async def user_register(user_data: UserRegister, response: Response):
     }
     await db.wallets.insert_one(wallet)
     
-    # Create session
-    session_token = f"session_{uuid.uuid4().hex}"
-    session_doc = {
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-        "created_at": datetime.now(timezone.utc)
-    }
-    await db.user_sessions.insert_one(session_doc)
-    
-    # Set cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        max_age=7 * 24 * 60 * 60,
-        path="/"
-    )
+    # Create session and set cookie
+    await create_user_session(new_user, response)
     
     user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0, "password_hash": 0})
     return user_doc
@@ -438,29 +2490,16 @@ async def user_register(user_data: UserRegister, response: Response):
 async def user_login(login_data: UserLogin, response: Response):
     """User login with email/password"""
     user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    if not user or not user.get("password_hash"):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await verify_password(login_data.password, user["password_hash"])
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        await db.users.update_one({"user_id": user["user_id"]}, {"$set": {"password_hash": new_hash}})
     
-    # Create session
-    session_token = f"session_{uuid.uuid4().hex}"
-    session_doc = {
-        "user_id": user["user_id"],
-        "session_token": session_token,
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-        "created_at": datetime.now(timezone.utc)
-    }
-    await db.user_sessions.insert_one(session_doc)
-    
-    # Set cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        max_age=7 * 24 * 60 * 60,
-        path="/"
-    )
+    # Create session and set cookie
+    await create_user_session(user, response)
     
     user_doc = await db.users.find_one({"user_id": user["user_id"]}, {"_id": 0, "password_hash": 0})
     return user_doc
@@ -473,16 +2512,17 @@ async def google_auth_session(request: Request, response: Response):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Session ID required")
     
     try:
-        async with httpx.AsyncClient() as client:
-            auth_response = await client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": session_id}
-            )
-            
-            if auth_response.status_code != 200:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
-            
-            user_data = auth_response.json()
+        auth_response = await upstream_request(
+            "emergent_auth",
+            "GET",
+            "/auth/v1/env/oauth/session-data",
+            headers={"X-Session-ID": session_id}
+        )
+        
+        if auth_response.status_code != 200:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+        
+        user_data = auth_response.json()
         
         # Check if user exists
         existing_user = await db.users.find_one({"email": user_data["email"]}, {"_id": 0})
@@ -511,26 +2551,8 @@ async def google_auth_session(request: Request, response: Response):
         else:
             user_id = existing_user["user_id"]
         
-        # Create session
-        session_token = user_data["session_token"]
-        session_doc = {
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-            "created_at": datetime.now(timezone.utc)
-        }
-        await db.user_sessions.insert_one(session_doc)
-        
-        # Set cookie
-        response.set_cookie(
-            key="session_token",
-            value=session_token,
-            httponly=True,
-            secure=True,
-            samesite="none",
-            max_age=7 * 24 * 60 * 60,
-            path="/"
-        )
+        # Create session and set cookie
+        await create_user_session(existing_user or new_user, response, session_token=user_data["session_token"])
         
         user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
         return User(**user_doc)
@@ -547,8 +2569,11 @@ async def get_me(current_user: User = Depends(get_current_user)):
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     """Logout user"""
-    session_token = request.cookies.get("session_token")
-    if session_token:
+    session_token = get_session_token(request)
+    if session_token and is_signed_session_token(session_token):
+        await revoke_signed_session(decode_signed_session_token(session_token))
+    elif session_token:
+        session_cache.pop(session_token)
         await db.user_sessions.delete_one({"session_token": session_token})
     
     response.delete_cookie(key="session_token", path="/")
@@ -568,7 +2593,7 @@ async def admin_register(admin_data: AdminRegister):
         "admin_id": admin_id,
         "email": admin_data.email,
         "name": admin_data.name,
-        "password_hash": hash_password(admin_data.password),
+        "password_hash": await hash_password(admin_data.password),
         "created_at": datetime.now(timezone.utc)
     }
     await db.admins.insert_one(new_admin)
@@ -580,18 +2605,58 @@ async def admin_register(admin_data: AdminRegister):
 async def admin_login(login_data: AdminLogin):
     """Admin login"""
     admin = await db.admins.find_one({"email": login_data.email})
-    if not admin or not verify_password(login_data.password, admin["password_hash"]):
+    if not admin:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await verify_password(login_data.password, admin["password_hash"])
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        await db.admins.update_one({"admin_id": admin["admin_id"]}, {"$set": {"password_hash": new_hash}})
     
     token = create_access_token({"admin_id": admin["admin_id"]})
     return {"access_token": token, "token_type": "bearer"}
 
+# ============= IMAGE ROUTES =============
+
+@api_router.get("/images/{image_hash}")
+async def get_image(image_hash: str, request: Request):
+    """Serve a stored image by content hash. The bytes behind a hash never change, so clients may cache forever."""
+    if not IMAGE_HASH_PATTERN.match(image_hash):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{image_hash}"'
+    }
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers["ETag"], headers["Cache-Control"])
+    
+    image = await db.images.find_one({"hash": image_hash}, {"_id": 0, "content_type": 1})
+    data = await image_store.get(image_hash) if image else None
+    if data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    return Response(content=data, media_type=image["content_type"], headers=headers)
+
 # ============= POLL ROUTES =============
 
+POLLS_CACHE_CONTROL = "no-cache"
+
 @api_router.get("/polls")
-async def get_polls():
-    """Get all active polls"""
-    polls = await db.polls.find({"status": "active"}, {"_id": 0}).to_list(1000)
+async def get_polls(request: Request, response: Response, fields: Optional[str] = None):
+    """Get all active polls as summaries; pass fields= to choose the returned fields"""
+    projection = poll_projection(fields)
+    versions = await merge_counter_shards(await db.polls.find(
+        {"status": "active"}, {"_id": 0, "poll_id": 1, "version": 1, "counter_shards": 1}
+    ).sort("poll_id", ASCENDING).to_list(None))
+    digest = hashlib.sha256(json.dumps([sorted(projection), versions], default=str).encode()).hexdigest()
+    etag = f'"polls-{digest[:32]}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, POLLS_CACHE_CONTROL)
+    
+    polls = await merge_counter_shards(
+        await db.polls.find({"status": "active"}, {**projection, "counter_shards": 1}).to_list(1000)
+    )
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = POLLS_CACHE_CONTROL
     return polls
 
 @api_router.get("/polls/{poll_id}")
@@ -600,6 +2665,7 @@ async def get_poll(poll_id: str):
     poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
     if not poll:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
+    await merge_counter_shards([poll])
     return poll
 
 @api_router.post("/polls/{poll_id}/purchase")
@@ -613,7 +2679,7 @@ async def purchase_votes(poll_id: str, request: PurchaseVotesRequest, req: Reque
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Poll is not active")
     
     amount = request.vote_count * poll["price_per_vote"]
-    order_id = f"order_{current_user.user_id[:8]}_{int(datetime.now(timezone.utc).timestamp() * 1000)}"
+    order_id = f"order_{uuid.uuid4().hex}"
     
     # Build return URL for redirect after payment using APP_URL
     app_url = os.getenv("APP_URL", str(req.base_url).rstrip('/'))
@@ -621,81 +2687,100 @@ async def purchase_votes(poll_id: str, request: PurchaseVotesRequest, req: Reque
         app_url = app_url.replace('http://', 'https://', 1)
     return_url = f"{app_url}/api/payment/callback?poll_id={poll_id}&order_id={order_id}&user_id={current_user.user_id}&vote_count={request.vote_count}&option_id={request.option_id or ''}"
     
-    try:
-        # Use Cashfree Orders API to create order with session token
-        cashfree_url = "https://sandbox.cashfree.com/pg/orders"
-        
-        order_payload = {
-            "order_id": order_id,
-            "order_amount": float(amount),
-            "order_currency": "INR",
-            "customer_details": {
-                "customer_id": current_user.user_id,
-                "customer_phone": "9999999999",
-                "customer_email": current_user.email,
-                "customer_name": current_user.name
-            },
-            "order_meta": {
-                "return_url": return_url,
-                "notify_url": f"{app_url}/api/payment/webhook"
-            },
-            "order_note": f"Vote purchase for poll: {poll['title'][:50]}"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                cashfree_url,
+    # Use Cashfree Orders API to create order with session token
+    order_payload = {
+        "order_id": order_id,
+        "order_amount": float(amount),
+        "order_currency": "INR",
+        "customer_details": {
+            "customer_id": current_user.user_id,
+            "customer_phone": "9999999999",
+            "customer_email": current_user.email,
+            "customer_name": current_user.name
+        },
+        "order_meta": {
+            "return_url": return_url,
+            "notify_url": f"{app_url}/api/payment/webhook"
+        },
+        "order_note": f"Vote purchase for poll: {poll['title'][:50]}"
+    }
+    
+    async def create_order() -> httpx.Response:
+        # The whole call gets one latency budget; gateway-side errors count against the breaker
+        response = await asyncio.wait_for(
+            upstream_request(
+                "cashfree",
+                "POST",
+                "/pg/orders",
                 json=order_payload,
                 headers={
                     "x-client-id": CASHFREE_CLIENT_ID,
                     "x-client-secret": CASHFREE_CLIENT_SECRET,
                     "x-api-version": CASHFREE_API_VERSION,
                     "Content-Type": "application/json"
-                },
-                timeout=15.0
-            )
-            
-            logger.info(f"Cashfree Order response status: {response.status_code}")
-            logger.info(f"Cashfree Order response: {response.text}")
-            
-            if response.status_code in [200, 201]:
-                cashfree_data = response.json()
-                payment_session_id = cashfree_data.get("payment_session_id")
-                
-                # Store transaction
-                transaction = {
-                    "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
-                    "user_id": current_user.user_id,
-                    "type": "purchase",
-                    "amount": amount,
-                    "status": "pending",
-                    "poll_id": poll_id,
-                    "cashfree_order_id": order_id,
-                    "vote_count": request.vote_count,
-                    "option_id": request.option_id,
-                    "created_at": datetime.now(timezone.utc)
                 }
-                await db.transactions.insert_one(transaction)
-                
-                # Return data needed for WebView checkout
-                return {
-                    "order_id": order_id,
-                    "payment_session_id": payment_session_id,
-                    "order_token": cashfree_data.get("order_token"),
-                    "cf_order_id": cashfree_data.get("cf_order_id"),
-                    "amount": amount,
-                    "status": "pending",
-                    "return_url": return_url,
-                    "environment": "sandbox"  # or "production"
-                }
-            else:
-                logger.error(f"Cashfree Order error: {response.text}")
-                # Fall back to auto-approve for testing when Cashfree fails
-                
+            ),
+            CASHFREE_ORDER_TIMEOUT
+        )
+        if response.status_code >= 500:
+            raise httpx.HTTPStatusError(f"Cashfree returned {response.status_code}", request=response.request, response=response)
+        return response
+    
+    unavailable = "Payment gateway is temporarily unavailable, please try again shortly"
+    try:
+        response = await cashfree_breaker.call(create_order)
+    except CircuitOpenError as e:
+        logger.warning(f"Cashfree circuit open, failing purchase for order {order_id}")
+        gateway_error = HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=unavailable,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
-        logger.error(f"Cashfree Order error: {str(e)}")
+        logger.error(f"Cashfree Order error: {e!r}")
+        gateway_error = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=unavailable)
+    else:
+        logger.info(f"Cashfree Order response status: {response.status_code}")
+        logger.info(f"Cashfree Order response: {response.text}")
+        
+        if response.status_code in [200, 201]:
+            cashfree_data = response.json()
+            payment_session_id = cashfree_data.get("payment_session_id")
+            
+            # Store transaction
+            transaction = {
+                "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
+                "user_id": current_user.user_id,
+                "type": "purchase",
+                "amount": amount,
+                "status": "pending",
+                "poll_id": poll_id,
+                "cashfree_order_id": order_id,
+                "vote_count": request.vote_count,
+                "option_id": request.option_id,
+                "created_at": datetime.now(timezone.utc)
+            }
+            await db.transactions.insert_one(transaction)
+            
+            # Return data needed for WebView checkout
+            return {
+                "order_id": order_id,
+                "payment_session_id": payment_session_id,
+                "order_token": cashfree_data.get("order_token"),
+                "cf_order_id": cashfree_data.get("cf_order_id"),
+                "amount": amount,
+                "status": "pending",
+                "return_url": return_url,
+                "environment": "sandbox"  # or "production"
+            }
+        
+        logger.error(f"Cashfree Order error: {response.text}")
+        gateway_error = HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Payment gateway rejected the order")
     
-    # Fallback: Auto-approve for testing when Cashfree API fails
+    if not PAYMENT_AUTO_APPROVE:
+        raise gateway_error
+    
+    # Fallback: Auto-approve for testing when Cashfree API fails (PAYMENT_AUTO_APPROVE only)
     transaction = {
         "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
         "user_id": current_user.user_id,
@@ -709,6 +2794,7 @@ async def purchase_votes(poll_id: str, request: PurchaseVotesRequest, req: Reque
         "created_at": datetime.now(timezone.utc)
     }
     await db.transactions.insert_one(transaction)
+    await apply_order_to_vote_balance(current_user.user_id, poll_id, order_id, purchased=request.vote_count)
     
     return {
         "order_id": order_id,
@@ -733,24 +2819,14 @@ async def cast_vote(poll_id: str, vote_request: CastVoteRequest, current_user: U
     if not option_exists:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid option")
     
-    # Check if user has enough purchased votes (transactions with status=success)
-    purchased_votes = await db.transactions.aggregate([
-        {"$match": {"user_id": current_user.user_id, "poll_id": poll_id, "type": "purchase", "status": "success"}},
-        {"$group": {"_id": None, "total_votes": {"$sum": "$vote_count"}}}
-    ]).to_list(1)
-    
-    total_purchased = purchased_votes[0]["total_votes"] if purchased_votes else 0
-    
-    # Check already cast votes
-    cast_votes = await db.votes.aggregate([
-        {"$match": {"user_id": current_user.user_id, "poll_id": poll_id}},
-        {"$group": {"_id": None, "total_cast": {"$sum": "$vote_count"}}}
-    ]).to_list(1)
-    
-    total_cast = cast_votes[0]["total_cast"] if cast_votes else 0
-    available_votes = total_purchased - total_cast
+    if vote_request.vote_count <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Vote count must be positive")
     
-    if available_votes < vote_request.vote_count:
+    # Check and spend purchased votes in a single conditional update
+    balance = await spend_votes(current_user.user_id, poll_id, vote_request.vote_count)
+    if not balance:
+        current = await db.vote_balances.find_one({"user_id": current_user.user_id, "poll_id": poll_id}, {"_id": 0})
+        available_votes = current["available"] if current else 0
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Insufficient votes. Available: {available_votes}")
     
     # Cast vote
@@ -764,16 +2840,21 @@ async def cast_vote(poll_id: str, vote_request: CastVoteRequest, current_user: U
         "transaction_id": "",
         "created_at": datetime.now(timezone.utc)
     }
-    await db.votes.insert_one(vote)
+    try:
+        await store_vote(vote, poll)
+    except Exception:
+        # Give the spent votes back if the vote could not be recorded
+        await adjust_vote_balance(current_user.user_id, poll_id, cast=-vote_request.vote_count)
+        raise
     
-    return {"message": "Vote cast successfully", "remaining_votes": available_votes - vote_request.vote_count}
+    return {"message": "Vote cast successfully", "remaining_votes": balance["available"] - vote_request.vote_count}
 
 # ============= WALLET ROUTES =============
 
 @api_router.get("/wallet")
-async def get_wallet(current_user: User = Depends(get_current_user)):
-    """Get user wallet balance"""
-    wallet = await db.wallets.find_one({"user_id": current_user.user_id}, {"_id": 0})
+async def get_wallet(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    """Get user wallet balance. Conditional on the wallet's version via ETag / If-None-Match."""
+    wallet = await db.wallets.find_one({"user_id": current_user.user_id}, {"_id": 0, "applied_settlements": 0})
     if not wallet:
         # Create wallet if not exists
         wallet = {
@@ -783,14 +2864,35 @@ async def get_wallet(current_user: User = Depends(get_current_user)):
             "updated_at": datetime.now(timezone.utc)
         }
         await db.wallets.insert_one(wallet)
+        wallet.pop("_id", None)
     
+    etag = f'"{wallet["wallet_id"]}-{wallet.pop("version", 0)}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, "private, no-cache")
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
     return wallet
 
 @api_router.get("/transactions")
-async def get_transactions(current_user: User = Depends(get_current_user)):
-    """Get user transactions"""
-    transactions = await db.transactions.find({"user_id": current_user.user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return transactions
+async def get_transactions(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get user transactions, newest first (pass X-Next-Cursor back as cursor for the next page)"""
+    return await paginate(db.transactions, {"user_id": current_user.user_id}, "transaction_id", limit, cursor, response)
+
+@api_router.get("/transactions/summary")
+async def get_transaction_summary(current_user: User = Depends(get_current_user)):
+    """Get the user's total transaction amount per type"""
+    totals = {}
+    async for row in db.transactions.aggregate([
+        {"$match": {"user_id": current_user.user_id}},
+        {"$group": {"_id": "$type", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}}
+    ]):
+        totals[row["_id"]] = {"amount": row["amount"], "count": row["count"]}
+    return {"totals": totals}
 
 @api_router.post("/withdrawal/request")
 async def request_withdrawal(withdrawal_request: WithdrawalRequest, current_user: User = Depends(get_current_user)):
@@ -820,84 +2922,56 @@ async def request_withdrawal(withdrawal_request: WithdrawalRequest, current_user
     return {"message": "Withdrawal request submitted", "withdrawal_id": withdrawal["withdrawal_id"]}
 
 @api_router.get("/withdrawal/history")
-async def get_withdrawal_history(current_user: User = Depends(get_current_user)):
-    """Get withdrawal history"""
-    withdrawals = await db.withdrawals.find({"user_id": current_user.user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return withdrawals
+async def get_withdrawal_history(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get withdrawal history, newest first"""
+    return await paginate(db.withdrawals, {"user_id": current_user.user_id}, "withdrawal_id", limit, cursor, response)
 
 @api_router.get("/my-polls")
 async def get_my_polls(current_user: User = Depends(get_current_user)):
     """Get user's poll participation history"""
-    # Get all votes by this user
-    votes = await db.votes.find({"user_id": current_user.user_id}, {"_id": 0}).to_list(1000)
-    
-    # Get unique poll IDs
-    poll_ids = list(set(v["poll_id"] for v in votes))
-    
-    # Get poll details and user's participation info
-    my_polls = []
-    for poll_id in poll_ids:
-        poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
-        if not poll:
-            continue
-            
-        user_votes = [v for v in votes if v["poll_id"] == poll_id]
-        total_votes = sum(v["vote_count"] for v in user_votes)
-        total_spent = sum(v["amount_paid"] for v in user_votes)
-        
-        # Get voted options
-        voted_options = []
-        for v in user_votes:
-            opt = next((o for o in poll["options"] if o["option_id"] == v["option_id"]), None)
-            voted_options.append({
-                "option_id": v["option_id"],
-                "option_text": opt["text"] if opt else "Unknown",
-                "vote_count": v["vote_count"],
-                "amount": v["amount_paid"]
-            })
-        
-        # Check result if poll is closed
-        result_status = "pending"
-        winning_amount = 0
-        if poll["status"] == "closed" and poll.get("result_option_id"):
-            user_option_ids = [v["option_id"] for v in user_votes]
-            if poll["result_option_id"] in user_option_ids:
-                result_status = "won"
-                # Get winning transaction
-                win_txn = await db.transactions.find_one({
-                    "user_id": current_user.user_id,
-                    "poll_id": poll_id,
-                    "type": "win"
-                }, {"_id": 0})
-                if win_txn:
-                    winning_amount = win_txn["amount"]
-            else:
-                result_status = "lost"
-        
-        my_polls.append({
-            "poll_id": poll_id,
-            "title": poll["title"],
-            "description": poll.get("description", ""),
-            "status": poll["status"],
-            "price_per_vote": poll["price_per_vote"],
-            "total_votes": total_votes,
-            "total_spent": total_spent,
-            "voted_options": voted_options,
-            "result_status": result_status,
-            "winning_amount": winning_amount,
-            "winning_option_id": poll.get("result_option_id"),
-            "created_at": poll.get("created_at")
-        })
+    summaries = await db.user_poll_summary.find(
+        {"user_id": current_user.user_id},
+        {"_id": 0}
+    ).sort("created_at", -1).to_list(None)
     
-    return my_polls
+    return [
+        {
+            "poll_id": summary["poll_id"],
+            "title": summary["title"],
+            "description": summary.get("description", ""),
+            "status": summary["poll_status"],
+            "price_per_vote": summary["price_per_vote"],
+            "total_votes": summary["total_votes"],
+            "total_spent": summary["total_spent"],
+            "voted_options": summary_voted_options(summary),
+            "result_status": summary["result_status"],
+            "winning_amount": summary["winning_amount"],
+            "winning_option_id": summary.get("winning_option_id"),
+            "created_at": summary.get("poll_created_at")
+        }
+        for summary in summaries
+    ]
 
 @api_router.put("/profile/upi")
-async def update_upi(upi_request: UpdateUPIRequest, current_user: User = Depends(get_current_user)):
+async def update_upi(upi_request: UpdateUPIRequest, request: Request, response: Response, current_user: User = Depends(get_current_user)):
     """Update UPI ID"""
     await db.users.update_one(
         {"user_id": current_user.user_id},
         {"$set": {"upi_id": upi_request.upi_id}}
     )
+    invalidate_user_sessions(current_user.user_id)
+    
+    # Signed sessions carry the profile, so swap the caller's token for an up-to-date one
+    session_token = get_session_token(request)
+    if session_token and is_signed_session_token(session_token):
+        payload = decode_signed_session_token(session_token)
+        await create_user_session({**current_user.model_dump(), "upi_id": upi_request.upi_id}, response)
+        await revoke_signed_session(payload)
     return {"message": "UPI ID updated successfully"}
 
 # ============= ADMIN ROUTES =============
@@ -907,22 +2981,23 @@ async def create_poll(poll_data: CreatePoll, current_admin: Admin = Depends(get_
     """Create new poll (admin only)"""
     poll_id = f"poll_{uuid.uuid4().hex[:12]}"
     
-    options = []
-    for opt in poll_data.options:
-        options.append({
-            "option_id": f"opt_{uuid.uuid4().hex[:8]}",
-            "text": opt["text"],
-            "image_base64": opt.get("image_base64")
-        })
+    options = [await build_poll_option(opt) for opt in poll_data.options]
     
     poll = {
         "poll_id": poll_id,
         "title": poll_data.title,
         "description": poll_data.description,
         "options": options,
+        "option_count": len(options),
         "price_per_vote": poll_data.price_per_vote,
         "status": "active",
         "result_option_id": None,
+        "tallies": {opt["option_id"]: empty_tally() for opt in options},
+        "total_votes": 0,
+        "total_amount": 0.0,
+        "voter_count": 0,
+        "version": 0,
+        "aggregates_version": POLL_AGGREGATES_VERSION,
         "created_at": datetime.now(timezone.utc),
         "closed_at": None
     }
@@ -938,13 +3013,7 @@ async def update_poll(poll_id: str, poll_data: CreatePoll, current_admin: Admin
     if not poll:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
     
-    options = []
-    for opt in poll_data.options:
-        options.append({
-            "option_id": f"opt_{uuid.uuid4().hex[:8]}",
-            "text": opt["text"],
-            "image_base64": opt.get("image_base64")
-        })
+    options = [await build_poll_option(opt) for opt in poll_data.options]
     
     await db.polls.update_one(
         {"poll_id": poll_id},
@@ -952,6 +3021,16 @@ async def update_poll(poll_id: str, poll_data: CreatePoll, current_admin: Admin
             "title": poll_data.title,
             "description": poll_data.description,
             "options": options,
+            "option_count": len(options),
+            "price_per_vote": poll_data.price_per_vote
+        }, "$inc": {"version": 1}}
+    )
+    results_cache.invalidate(poll_id)
+    await db.user_poll_summary.update_many(
+        {"poll_id": poll_id},
+        {"$set": {
+            "title": poll_data.title,
+            "description": poll_data.description,
             "price_per_vote": poll_data.price_per_vote
         }}
     )
@@ -996,89 +3075,163 @@ async def set_poll_result(poll_id: str, result_data: SetResultRequest, current_a
     if not option_exists:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid winning option")
     
-    # Calculate winnings
-    all_votes = await db.votes.find({"poll_id": poll_id}).to_list(10000)
-    
-    winning_votes = [v for v in all_votes if v["option_id"] == result_data.winning_option_id]
-    losing_votes = [v for v in all_votes if v["option_id"] != result_data.winning_option_id]
-    
-    total_losing_amount = sum(v["amount_paid"] for v in losing_votes)
-    total_winning_votes = sum(v["vote_count"] for v in winning_votes)
+    now = datetime.now(timezone.utc)
+    job = {
+        "job_id": f"settle_{uuid.uuid4().hex[:12]}",
+        "poll_id": poll_id,
+        "winning_option_id": result_data.winning_option_id,
+        "status": "pending",
+        "attempts": 0,
+        "per_vote_share": None,
+        "total_winners": None,
+        "winners_credited": 0,
+        "amount_credited": 0.0,
+        "last_user_id": None,
+        "locked_by": None,
+        "locked_until": None,
+        "error": None,
+        "created_by": current_admin.admin_id,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None
+    }
+    # Store the job first: if this request dies before the poll changes, the sweeper still
+    # finds the job and finishes the settlement instead of leaving the poll stuck
+    await db.settlement_jobs.insert_one(job)
     
-    if total_winning_votes > 0:
-        per_vote_share = total_losing_amount / total_winning_votes
-        
-        # Distribute to winners
-        user_winnings = {}
-        for vote in winning_votes:
-            user_id = vote["user_id"]
-            winning_amount = vote["vote_count"] * per_vote_share
-            user_winnings[user_id] = user_winnings.get(user_id, 0) + winning_amount
-        
-        # Update wallets
-        for user_id, amount in user_winnings.items():
-            await db.wallets.update_one(
-                {"user_id": user_id},
-                {
-                    "$inc": {"balance": amount},
-                    "$set": {"updated_at": datetime.now(timezone.utc)}
-                }
-            )
-            
-            # Create transaction
-            transaction = {
-                "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
-                "user_id": user_id,
-                "type": "win",
-                "amount": amount,
-                "status": "success",
-                "poll_id": poll_id,
-                "cashfree_order_id": None,
-                "created_at": datetime.now(timezone.utc)
-            }
-            await db.transactions.insert_one(transaction)
+    # Stop voting and record the result; the poll moves to closed once settlement finishes
+    if not await begin_settlement(job):
+        await cancel_settlement_job(job, "Poll was already closed")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Poll is already closed")
     
-    # Close poll
-    await db.polls.update_one(
-        {"poll_id": poll_id},
-        {
-            "$set": {
-                "status": "closed",
-                "result_option_id": result_data.winning_option_id,
-                "closed_at": datetime.now(timezone.utc)
-            }
-        }
-    )
+    claimed = await claim_settlement_job(job["job_id"])
+    if claimed:
+        spawn_background(run_settlement_job(claimed))
     
     return {
-        "message": "Poll result set successfully",
-        "winners_count": len(user_winnings) if total_winning_votes > 0 else 0,
-        "total_distributed": total_losing_amount
+        "message": "Poll result set, settlement started",
+        "job_id": job["job_id"],
+        "status": "pending"
     }
 
+@api_router.get("/admin/settlements")
+async def get_settlement_jobs(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    job_status: Optional[str] = Query(None, alias="status"),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get settlement jobs, newest first, optionally only those with a given status (admin only)"""
+    query = {"status": job_status} if job_status else {}
+    return await paginate(db.settlement_jobs, query, "job_id", limit, cursor, response)
+
+@api_router.post("/admin/settlements/{job_id}/retry")
+async def retry_settlement_job(job_id: str, current_admin: Admin = Depends(get_current_admin)):
+    """Restart a failed or stalled settlement job with a fresh set of attempts (admin only)"""
+    now = datetime.now(timezone.utc)
+    requeue = {"status": "pending", "attempts": 0, "error": None, "locked_until": None, "updated_at": now}
+    job = await db.settlement_jobs.find_one_and_update(
+        {
+            "job_id": job_id,
+            "status": {"$in": ["pending", "running", "failed"]},
+            "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}]
+        },
+        {"$set": requeue},
+        projection={"_id": 0}
+    )
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No failed or stalled settlement job with this id")
+    
+    claimed = await claim_settlement_job(job_id)
+    if claimed:
+        spawn_background(run_settlement_job(claimed))
+    return {**job, **requeue}
+
+@api_router.get("/admin/settlements/{job_id}")
+async def get_settlement_job(job_id: str, current_admin: Admin = Depends(get_current_admin)):
+    """Get settlement job progress (admin only)"""
+    job = await db.settlement_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Settlement job not found")
+    
+    total_winners = job.get("total_winners")
+    if job["status"] == "completed":
+        job["progress"] = 100.0
+    elif total_winners:
+        job["progress"] = round(job["winners_credited"] / total_winners * 100, 1)
+    else:
+        job["progress"] = 0.0
+    return job
+
 @api_router.get("/admin/polls")
-async def get_all_polls_admin(current_admin: Admin = Depends(get_current_admin)):
-    """Get all polls for admin"""
-    polls = await db.polls.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return polls
+async def get_all_polls_admin(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get all polls for admin as summaries, newest first; pass fields= to choose the returned fields"""
+    polls = await paginate(db.polls, {}, "poll_id", limit, cursor, response, {**poll_projection(fields), "counter_shards": 1})
+    return await merge_counter_shards(polls)
 
 @api_router.get("/admin/users")
-async def get_all_users(current_admin: Admin = Depends(get_current_admin)):
-    """Get all users (admin only)"""
-    users = await db.users.find({}, {"_id": 0}).to_list(1000)
-    return users
+async def get_all_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get all users, newest first (admin only)"""
+    return await paginate(db.users, {}, "user_id", limit, cursor, response)
 
 @api_router.get("/admin/transactions")
-async def get_all_transactions(current_admin: Admin = Depends(get_current_admin)):
-    """Get all transactions (admin only)"""
-    transactions = await db.transactions.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return transactions
+async def get_all_transactions(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get all transactions, newest first (admin only)"""
+    return await paginate(db.transactions, {}, "transaction_id", limit, cursor, response)
 
 @api_router.get("/admin/withdrawals")
-async def get_pending_withdrawals(current_admin: Admin = Depends(get_current_admin)):
-    """Get all withdrawal requests (admin only)"""
-    withdrawals = await db.withdrawals.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return withdrawals
+async def get_pending_withdrawals(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    withdrawal_status: Optional[str] = Query(None, alias="status"),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get withdrawal requests, newest first, optionally only those with a given status (admin only)"""
+    query = {"status": withdrawal_status} if withdrawal_status else {}
+    return await paginate(db.withdrawals, query, "withdrawal_id", limit, cursor, response)
+
+@api_router.get("/admin/webhooks/dead-letter")
+async def get_dead_webhooks(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get webhook events that ran out of retries, newest first (admin only)"""
+    return await paginate(db.webhook_inbox, {"status": "dead"}, "event_id", limit, cursor, response)
+
+@api_router.post("/admin/webhooks/{event_id}/retry")
+async def retry_dead_webhook(event_id: str, current_admin: Admin = Depends(get_current_admin)):
+    """Put a dead-lettered webhook event back in the inbox with a fresh set of attempts (admin only)"""
+    now = datetime.now(timezone.utc)
+    requeue = {"status": "pending", "attempts": 0, "error": None, "next_attempt_at": now, "updated_at": now}
+    event = await db.webhook_inbox.find_one_and_update(
+        {"event_id": event_id, "status": "dead"},
+        {"$set": requeue},
+        projection={"_id": 0}
+    )
+    if not event:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dead-lettered webhook event not found")
+    webhook_wakeup.set()
+    return {**event, **requeue}
 
 @api_router.put("/admin/withdrawals/{withdrawal_id}/approve")
 async def approve_withdrawal(withdrawal_id: str, current_admin: Admin = Depends(get_current_admin)):
@@ -1098,7 +3251,7 @@ async def approve_withdrawal(withdrawal_id: str, current_admin: Admin = Depends(
     await db.wallets.update_one(
         {"user_id": withdrawal["user_id"]},
         {
-            "$inc": {"balance": -withdrawal["amount"]},
+            "$inc": {"balance": -withdrawal["amount"], "version": 1},
             "$set": {"updated_at": datetime.now(timezone.utc)}
         }
     )
@@ -1122,7 +3275,6 @@ async def approve_withdrawal(withdrawal_id: str, current_admin: Admin = Depends(
         "amount": -withdrawal["amount"],
         "status": "success",
         "poll_id": None,
-        "cashfree_order_id": None,
         "created_at": datetime.now(timezone.utc)
     })
     
@@ -1153,27 +3305,122 @@ async def reject_withdrawal(withdrawal_id: str, notes: str = "", current_admin:
 
 @api_router.get("/admin/analytics")
 async def get_analytics(current_admin: Admin = Depends(get_current_admin)):
-    """Get dashboard analytics (admin only)"""
-    total_users = await db.users.count_documents({"is_deleted": {"$ne": True}})
-    total_polls = await db.polls.count_documents({})
-    active_polls = await db.polls.count_documents({"status": "active"})
-    pending_withdrawals = await db.withdrawals.count_documents({"status": "pending"})
-    closed_polls = await db.polls.count_documents({"status": "closed"})
-    
-    total_transactions = await db.transactions.aggregate([
-        {"$match": {"status": "success", "type": "purchase"}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    
-    total_revenue = total_transactions[0]["total"] if total_transactions else 0
-    
+    """Get dashboard analytics from the background snapshot (admin only)"""
+    as_of = analytics_snapshot.get("as_of")
+    if as_of and datetime.now(timezone.utc) - as_of < timedelta(seconds=2 * ANALYTICS_REFRESH_INTERVAL):
+        return dict(analytics_snapshot)
+    # No snapshot yet, or the refresher has fallen behind
+    return await refresh_analytics_snapshot()
+
+@api_router.get("/admin/metrics")
+async def get_metrics(current_admin: Admin = Depends(get_current_admin)):
+    """Get in-process cache and runtime metrics (admin only)"""
+    return {
+        "worker_id": WORKER_ID,
+        "session_mode": USER_SESSION_MODE,
+        "session_cache": session_cache.stats(),
+        "results_cache": results_cache.stats(),
+        "vote_ingest": vote_ingestor.stats(),
+        "webhook_inbox": {"workers": WEBHOOK_WORKERS, **webhook_stats},
+        "live_results": {
+            "polls": len(live_broadcasters),
+            "subscribers": sum(len(b.subscribers) for b in live_broadcasters.values())
+        },
+        "session_revocations": {
+            "tokens": len(session_revocations.token_ids),
+            "users": len(session_revocations.users)
+        },
+        "password_pool": {
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_pending": PASSWORD_HASH_MAX_PENDING,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            **password_pool_stats
+        },
+        "http_pools": http_pool_metrics(),
+        "circuit_breakers": {"cashfree": cashfree_breaker.stats()}
+    }
+
+# Columns exported for each collection (also the projection, so secrets never leave the database)
+EXPORT_FIELDS = {
+    "transactions": ["transaction_id", "user_id", "type", "amount", "status", "poll_id", "cashfree_order_id", "vote_count", "option_id", "created_at"],
+    "votes": ["vote_id", "poll_id", "user_id", "option_id", "vote_count", "amount_paid", "cashfree_order_id", "created_at"],
+    "withdrawals": ["withdrawal_id", "user_id", "amount", "fee", "net_amount", "upi_id", "status", "admin_notes", "created_at", "processed_at"],
+    "users": ["user_id", "email", "name", "upi_id", "is_deleted", "created_at"]
+}
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def stream_export(collection: str, query: dict, export_format: str):
+    """Yield an export row by row from a cursor, so memory stays flat regardless of size"""
+    fields = EXPORT_FIELDS[collection]
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue()
+    
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = db[collection].find(query, projection).sort("created_at", ASCENDING).batch_size(EXPORT_BATCH_SIZE)
+    try:
+        async for doc in cursor:
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow(["" if doc.get(field) is None else export_value(doc[field]) for field in fields])
+                yield buffer.getvalue()
+            else:
+                yield json.dumps({field: export_value(doc.get(field)) for field in fields}, default=str) + "\n"
+    finally:
+        await cursor.close()
+
+@api_router.get("/admin/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Stream a full export of transactions, votes, withdrawals or users as NDJSON or CSV (admin only)"""
+    if collection not in EXPORT_FIELDS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown export")
+    
+    query = {}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    if type:
+        if "type" not in EXPORT_FIELDS[collection]:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{collection} cannot be filtered by type")
+        query["type"] = type
+    if status_filter:
+        if "status" not in EXPORT_FIELDS[collection]:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{collection} cannot be filtered by status")
+        query["status"] = status_filter
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"{collection}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        stream_export(collection, query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/indexes/audit")
+async def audit_indexes(current_admin: Admin = Depends(get_current_admin)):
+    """Explain every query shape the server issues and flag collection scans (admin only)"""
+    results = await audit_query_plans()
     return {
-        "total_users": total_users,
-        "total_polls": total_polls,
-        "active_polls": active_polls,
-        "closed_polls": closed_polls,
-        "pending_withdrawals": pending_withdrawals,
-        "total_revenue": total_revenue
+        "collection_scans": [r["name"] for r in results if r.get("collection_scan")],
+        "queries": results
     }
 
 # ============= USER MANAGEMENT ROUTES =============
@@ -1191,47 +3438,22 @@ async def get_user_detail(user_id: str, current_admin: Admin = Depends(get_curre
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
     # Get wallet
-    wallet = await db.wallets.find_one({"user_id": user_id}, {"_id": 0})
-    
-    # Get user's votes with poll info
-    votes = await db.votes.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
+    wallet = await db.wallets.find_one({"user_id": user_id}, {"_id": 0, "applied_settlements": 0, "version": 0})
     
     # Get poll participation details
     poll_participation = []
-    poll_ids = list(set(v["poll_id"] for v in votes))
-    for poll_id in poll_ids:
-        poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
-        if poll:
-            user_votes = [v for v in votes if v["poll_id"] == poll_id]
-            total_votes = sum(v["vote_count"] for v in user_votes)
-            total_spent = sum(v["amount_paid"] for v in user_votes)
-            
-            # Check if user won
-            user_won = False
-            winning_amount = 0
-            if poll.get("result_option_id"):
-                user_voted_options = [v["option_id"] for v in user_votes]
-                if poll["result_option_id"] in user_voted_options:
-                    user_won = True
-                    # Get winning transaction
-                    win_txn = await db.transactions.find_one({
-                        "user_id": user_id, 
-                        "poll_id": poll_id, 
-                        "type": "win"
-                    }, {"_id": 0})
-                    if win_txn:
-                        winning_amount = win_txn["amount"]
-            
-            poll_participation.append({
-                "poll_id": poll_id,
-                "poll_title": poll["title"],
-                "poll_status": poll["status"],
-                "total_votes": total_votes,
-                "total_spent": total_spent,
-                "voted_options": [v["option_id"] for v in user_votes],
-                "user_won": user_won,
-                "winning_amount": winning_amount
-            })
+    for entry in await load_participation(user_id):
+        poll = entry["poll"]
+        poll_participation.append({
+            "poll_id": poll["poll_id"],
+            "poll_title": poll["title"],
+            "poll_status": poll["status"],
+            "total_votes": entry["total_votes"],
+            "total_spent": entry["total_spent"],
+            "voted_options": [v["option_id"] for v in entry["votes"]],
+            "user_won": entry["user_won"],
+            "winning_amount": entry["winning_amount"]
+        })
     
     # Get transactions
     transactions = await db.transactions.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
@@ -1264,6 +3486,9 @@ async def update_user(user_id: str, user_data: UpdateUserRequest, current_admin:
     
     if update_data:
         await db.users.update_one({"user_id": user_id}, {"$set": update_data})
+        invalidate_user_sessions(user_id)
+        # Signed sessions carry the old profile; the user has to sign in again to pick up the change
+        await revoke_signed_sessions(user_id)
     
     return {"message": "User updated successfully"}
 
@@ -1281,7 +3506,7 @@ async def delete_user(user_id: str, current_admin: Admin = Depends(get_current_a
     )
     
     # Invalidate all sessions
-    await db.user_sessions.delete_many({"user_id": user_id})
+    await revoke_user_sessions(user_id)
     
     return {"message": "User deleted successfully"}
 
@@ -1302,65 +3527,81 @@ async def restore_user(user_id: str, current_admin: Admin = Depends(get_current_
 # ============= POLL STATISTICS ROUTES =============
 
 @api_router.get("/admin/polls/{poll_id}/stats")
-async def get_poll_stats(poll_id: str, current_admin: Admin = Depends(get_current_admin)):
-    """Get detailed poll statistics"""
+async def get_poll_stats(
+    poll_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Get detailed poll statistics, with one page of voters newest first"""
     poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
     if not poll:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
     
-    # Get all votes for this poll
-    votes = await db.votes.find({"poll_id": poll_id}, {"_id": 0}).to_list(10000)
-    
-    # Calculate total amount collected
-    total_amount = sum(v["amount_paid"] for v in votes)
-    total_votes = sum(v["vote_count"] for v in votes)
+    # Totals and per-option stats come from the running tallies on the poll (and its counter shards)
+    await merge_counter_shards([poll])
+    tallies = poll.pop("tallies", {})
+    total_amount = poll.get("total_amount", 0)
+    total_votes = poll.get("total_votes", 0)
     
-    # Get votes per option
     option_stats = {}
     for opt in poll["options"]:
-        opt_votes = [v for v in votes if v["option_id"] == opt["option_id"]]
+        tally = tallies.get(opt["option_id"], empty_tally())
         option_stats[opt["option_id"]] = {
             "text": opt["text"],
-            "vote_count": sum(v["vote_count"] for v in opt_votes),
-            "amount": sum(v["amount_paid"] for v in opt_votes),
-            "voter_count": len(set(v["user_id"] for v in opt_votes))
+            "vote_count": tally["vote_count"],
+            "amount": tally["amount"],
+            "voter_count": tally["voter_count"]
         }
     
-    # Get voter details
+    # The per-user grouping is already materialized in user_poll_summary. The voter page seeks
+    # on the (poll_id, created_at, user_id) index and joins only its own rows to users; the
+    # breakdown runs alongside it
+    voter_page = db.user_poll_summary.aggregate([
+        {"$match": after_cursor({"poll_id": poll_id}, "user_id", cursor)},
+        {"$sort": {"created_at": DESCENDING, "user_id": DESCENDING}},
+        {"$limit": limit + 1},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "user_id", "as": "user"}},
+        {"$project": {
+            "_id": 0, "user_id": 1, "created_at": 1, "total_votes": 1, "total_spent": 1, "options": 1,
+            "result_status": 1, "winning_amount": 1, "user.name": 1, "user.email": 1
+        }}
+    ]).to_list(limit + 1)
+    breakdown = db.user_poll_summary.aggregate([
+        {"$match": {"poll_id": poll_id}},
+        {"$group": {"_id": "$result_status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    voters, breakdown = await asyncio.gather(voter_page, breakdown)
+    
+    if len(voters) > limit:
+        voters = voters[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(voters[-1], "user_id")
+    
     voter_details = []
-    user_ids = list(set(v["user_id"] for v in votes))
-    for uid in user_ids:
-        user = await db.users.find_one({"user_id": uid}, {"_id": 0, "password_hash": 0})
-        user_votes = [v for v in votes if v["user_id"] == uid]
-        
-        voter_info = {
-            "user_id": uid,
-            "user_name": user["name"] if user else "Unknown",
-            "user_email": user["email"] if user else "Unknown",
-            "total_votes": sum(v["vote_count"] for v in user_votes),
-            "total_amount": sum(v["amount_paid"] for v in user_votes),
-            "voted_options": []
-        }
-        
-        for v in user_votes:
-            opt = next((o for o in poll["options"] if o["option_id"] == v["option_id"]), None)
-            voter_info["voted_options"].append({
-                "option_id": v["option_id"],
-                "option_text": opt["text"] if opt else "Unknown",
-                "vote_count": v["vote_count"],
-                "amount": v["amount_paid"]
-            })
-        
-        voter_details.append(voter_info)
+    for voter in voters:
+        user = voter["user"][0] if voter["user"] else {}
+        voter_details.append({
+            "user_id": voter["user_id"],
+            "user_name": user.get("name", "Unknown"),
+            "user_email": user.get("email", "Unknown"),
+            "total_votes": voter["total_votes"],
+            "total_amount": voter["total_spent"],
+            "voted_options": summary_voted_options(voter),
+            "result_status": voter["result_status"],
+            "winning_amount": voter["winning_amount"]
+        })
+    voter_breakdown = {row["_id"]: row["count"] for row in breakdown}
     
     # Win/Loss stats if poll is closed
     win_loss_stats = None
     if poll["status"] == "closed" and poll.get("result_option_id"):
         winning_option = poll["result_option_id"]
-        winning_votes = sum(v["vote_count"] for v in votes if v["option_id"] == winning_option)
-        losing_votes = sum(v["vote_count"] for v in votes if v["option_id"] != winning_option)
-        winning_amount = sum(v["amount_paid"] for v in votes if v["option_id"] == winning_option)
-        losing_amount = sum(v["amount_paid"] for v in votes if v["option_id"] != winning_option)
+        winning_tally = tallies.get(winning_option, empty_tally())
+        winning_votes = winning_tally["vote_count"]
+        losing_votes = total_votes - winning_votes
+        winning_amount = winning_tally["amount"]
+        losing_amount = total_amount - winning_amount
         
         win_loss_stats = {
             "winning_option_id": winning_option,
@@ -1376,32 +3617,30 @@ async def get_poll_stats(poll_id: str, current_admin: Admin = Depends(get_curren
         "poll": poll,
         "total_amount": total_amount,
         "total_votes": total_votes,
-        "unique_voters": len(user_ids),
+        "unique_voters": poll.get("voter_count", 0),
         "option_stats": option_stats,
         "voter_details": voter_details,
+        "voter_breakdown": voter_breakdown,
         "win_loss_stats": win_loss_stats
     }
 
 # ============= PUBLIC POLL STATS FOR MOBILE APP =============
 
-@api_router.get("/polls/{poll_id}/results")
-async def get_poll_results(poll_id: str):
-    """Get poll results for mobile app"""
+async def compute_poll_results(poll_id: str) -> tuple:
+    """Build the public results for a poll from its tallies; returns (version, body)"""
     poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
     if not poll:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
+    await merge_counter_shards([poll])
     
-    # Get all votes
-    votes = await db.votes.find({"poll_id": poll_id}, {"_id": 0}).to_list(10000)
-    
-    total_votes = sum(v["vote_count"] for v in votes)
-    total_amount = sum(v["amount_paid"] for v in votes)
+    tallies = poll.get("tallies", {})
+    total_votes = poll.get("total_votes", 0)
+    total_amount = poll.get("total_amount", 0)
     
     # Option breakdown
     option_results = []
     for opt in poll["options"]:
-        opt_votes = [v for v in votes if v["option_id"] == opt["option_id"]]
-        vote_count = sum(v["vote_count"] for v in opt_votes)
+        vote_count = tallies.get(opt["option_id"], empty_tally())["vote_count"]
         percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
         
         option_results.append({
@@ -1412,7 +3651,7 @@ async def get_poll_results(poll_id: str):
             "is_winner": opt["option_id"] == poll.get("result_option_id")
         })
     
-    return {
+    return poll.get("version", 0), {
         "poll_id": poll_id,
         "status": poll["status"],
         "total_votes": total_votes,
@@ -1421,63 +3660,154 @@ async def get_poll_results(poll_id: str):
         "option_results": option_results
     }
 
+@api_router.get("/polls/{poll_id}/results")
+async def get_poll_results(poll_id: str, request: Request, response: Response):
+    """Get poll results for mobile app"""
+    version, results = await results_cache.get(poll_id, lambda: compute_poll_results(poll_id))
+    etag = f'"{poll_id}-{version}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, POLLS_CACHE_CONTROL)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = POLLS_CACHE_CONTROL
+    return results
+
+class PollBroadcaster:
+    """Fans one poll's results out to every live subscriber on this worker.
+    
+    A single producer task per poll reads the results (through results_cache) at most once
+    per LIVE_BROADCAST_INTERVAL and publishes only when the poll's version has moved.
+    Each subscriber holds just the latest message, so a slow client skips stale frames
+    instead of building a backlog.
+    """
+    
+    def __init__(self, poll_id: str):
+        self.poll_id = poll_id
+        self.subscribers: set = set()
+        self.latest: Optional[str] = None
+        self.version = None
+        self.producer: Optional[asyncio.Task] = None
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self.subscribers.add(queue)
+        if self.producer is None or self.producer.done():
+            self.producer = spawn_background(self.produce())
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+    
+    def publish(self, message: str):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+    
+    async def produce(self):
+        try:
+            while self.subscribers:
+                try:
+                    version, results = await results_cache.get(self.poll_id, lambda: compute_poll_results(self.poll_id))
+                    if version != self.version:
+                        self.version = version
+                        self.latest = json.dumps(results, default=str)
+                        self.publish(self.latest)
+                except Exception as e:
+                    logger.error(f"Live results error for poll {self.poll_id}: {e}")
+                await asyncio.sleep(LIVE_BROADCAST_INTERVAL)
+        finally:
+            if live_broadcasters.get(self.poll_id) is self and not self.subscribers:
+                del live_broadcasters[self.poll_id]
+
+live_broadcasters: Dict[str, PollBroadcaster] = {}
+
+def live_subscribe(poll_id: str) -> tuple:
+    broadcaster = live_broadcasters.get(poll_id)
+    if broadcaster is None:
+        broadcaster = live_broadcasters[poll_id] = PollBroadcaster(poll_id)
+    return broadcaster, broadcaster.subscribe()
+
+@api_router.get("/polls/{poll_id}/live")
+async def stream_poll_results(poll_id: str, request: Request):
+    """Server-sent events stream of a poll's results; each event carries the /results body"""
+    await results_cache.get(poll_id, lambda: compute_poll_results(poll_id))
+    broadcaster, queue = live_subscribe(poll_id)
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: results\ndata: {message}\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.websocket("/polls/{poll_id}/live")
+async def websocket_poll_results(websocket: WebSocket, poll_id: str):
+    """WebSocket stream of a poll's results; each text frame is the /results body"""
+    try:
+        await results_cache.get(poll_id, lambda: compute_poll_results(poll_id))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    broadcaster, queue = live_subscribe(poll_id)
+    
+    async def forward():
+        while True:
+            await websocket.send_text(await queue.get())
+    
+    async def until_closed():
+        # Clients don't send anything; this just notices the disconnect
+        while True:
+            await websocket.receive_text()
+    
+    tasks = [asyncio.ensure_future(forward()), asyncio.ensure_future(until_closed())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Live results socket for poll {poll_id} closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        broadcaster.unsubscribe(queue)
+
 @api_router.get("/polls/{poll_id}/my-result")
 async def get_my_poll_result(poll_id: str, current_user: User = Depends(get_current_user)):
     """Get user's result for a specific poll"""
-    poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0})
-    if not poll:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
-    
-    # Get user's votes
-    user_votes = await db.votes.find({"poll_id": poll_id, "user_id": current_user.user_id}, {"_id": 0}).to_list(100)
+    summary = await db.user_poll_summary.find_one({"user_id": current_user.user_id, "poll_id": poll_id}, {"_id": 0})
     
-    if not user_votes:
+    if not summary:
+        poll = await db.polls.find_one({"poll_id": poll_id}, {"_id": 0, "poll_id": 1})
+        if not poll:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
         return {
             "participated": False,
             "message": "You did not participate in this poll"
         }
     
-    total_votes = sum(v["vote_count"] for v in user_votes)
-    total_spent = sum(v["amount_paid"] for v in user_votes)
-    voted_options = []
-    
-    for v in user_votes:
-        opt = next((o for o in poll["options"] if o["option_id"] == v["option_id"]), None)
-        voted_options.append({
-            "option_id": v["option_id"],
-            "option_text": opt["text"] if opt else "Unknown",
-            "vote_count": v["vote_count"],
-            "amount": v["amount_paid"]
-        })
-    
-    # Check win/loss if poll is closed
-    result_status = "pending"
-    winning_amount = 0
-    
-    if poll["status"] == "closed" and poll.get("result_option_id"):
-        user_voted_option_ids = [v["option_id"] for v in user_votes]
-        if poll["result_option_id"] in user_voted_option_ids:
-            result_status = "won"
-            # Get winning transaction
-            win_txn = await db.transactions.find_one({
-                "user_id": current_user.user_id,
-                "poll_id": poll_id,
-                "type": "win"
-            }, {"_id": 0})
-            if win_txn:
-                winning_amount = win_txn["amount"]
-        else:
-            result_status = "lost"
-    
     return {
         "participated": True,
-        "poll_status": poll["status"],
-        "total_votes": total_votes,
-        "total_spent": total_spent,
-        "voted_options": voted_options,
-        "result_status": result_status,
-        "winning_amount": winning_amount,
-        "winning_option_id": poll.get("result_option_id")
+        "poll_status": summary["poll_status"],
+        "total_votes": summary["total_votes"],
+        "total_spent": summary["total_spent"],
+        "voted_options": summary_voted_options(summary),
+        "result_status": summary["result_status"],
+        "winning_amount": summary["winning_amount"],
+        "winning_option_id": summary.get("winning_option_id")
     }
 
 # ============= PAYMENT WEBHOOK =============
@@ -1485,31 +3815,25 @@ async def get_my_poll_result(poll_id: str, current_user: User = Depends(get_curr
 @api_router.post("/payments/webhook")
 async def payment_webhook(request: Request):
     """Handle Cashfree payment webhooks"""
+    body = await request.body()
+    event_id = hashlib.sha256(body).hexdigest()
+    now = datetime.now(timezone.utc)
     try:
-        body = await request.body()
-        payload = await request.json()
-        
-        event_type = payload.get("type")
-        order_id = payload.get("data", {}).get("order", {}).get("order_id")
-        
-        logger.info(f"Webhook received: {event_type} for order {order_id}")
-        
-        if event_type == "PAYMENT_SUCCESS_WEBHOOK":
-            # Update transaction
-            transaction = await db.transactions.find_one({"cashfree_order_id": order_id})
-            if transaction:
-                await db.transactions.update_one(
-                    {"cashfree_order_id": order_id},
-                    {"$set": {"status": "success"}}
-                )
-                
-                logger.info(f"Payment processed successfully: {order_id}")
-        
-        return {"status": "success"}
+        await db.webhook_inbox.insert_one({
+            "event_id": event_id,
+            "payload": body.decode("utf-8", errors="replace"),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "updated_at": now
+        })
+        webhook_stats["received"] += 1
+        webhook_wakeup.set()
+    except DuplicateKeyError:
+        webhook_stats["duplicates"] += 1
     
-    except Exception as e:
-        logger.error(f"Webhook error: {str(e)}")
-        return {"status": "error", "message": str(e)}
+    return {"status": "success", "event_id": event_id}
 
 # ============= INCLUDE ROUTER =============
 
@@ -1535,8 +3859,103 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+@app.on_event("startup")
+async def create_indexes():
+    created = await ensure_indexes()
+    logger.info(f"Index bootstrap complete ({len(created)} indexes ensured)")
+
+@app.on_event("startup")
+async def backfill_poll_images():
+    """Move images stored inline in poll documents into the image store"""
+    migrated = await migrate_inline_images()
+    if migrated:
+        logger.info(f"Moved inline option images out of {migrated} polls")
+
+@app.on_event("startup")
+async def backfill_poll_aggregates():
+    """Build tallies and user poll summaries for polls created before they were tracked"""
+    async for poll in db.polls.find(
+        {"aggregates_version": {"$ne": POLL_AGGREGATES_VERSION}},
+        {"_id": 0}
+    ):
+        await rebuild_poll_aggregates(poll)
+        logger.info(f"Backfilled vote aggregates for poll {poll['poll_id']}")
+
+@app.on_event("startup")
+async def backfill_poll_option_counts():
+    """Store option_count on polls created before list endpoints returned it"""
+    result = await backfill_option_counts()
+    if result.modified_count:
+        logger.info(f"Backfilled option_count on {result.modified_count} polls")
+
+@app.on_event("startup")
+async def backfill_vote_balances():
+    """Build the vote balance ledger the first time the server runs against existing data"""
+    if await db.vote_balances.estimated_document_count() == 0:
+        count = await rebuild_vote_balances()
+        if count:
+            logger.info(f"Backfilled {count} vote balances")
+
+@app.on_event("startup")
+async def start_http_clients():
+    for name in UPSTREAM_HOSTS:
+        get_http_client(name)
+
+@app.on_event("startup")
+async def start_settlement_sweeper():
+    spawn_background(settlement_sweeper())
+
+@app.on_event("startup")
+async def start_webhook_consumers():
+    for _ in range(WEBHOOK_WORKERS):
+        spawn_background(webhook_consumer())
+
+@app.on_event("startup")
+async def start_vote_ingestor():
+    if VOTE_BATCHING:
+        vote_ingestor.start()
+
+@app.on_event("startup")
+async def start_analytics_refresher():
+    spawn_background(analytics_refresher())
+
+@app.on_event("startup")
+async def start_session_revocation_refresh():
+    await session_revocations.refresh()
+    spawn_background(refresh_session_revocations())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await vote_ingestor.drain()
+    for task in list(background_tasks):
+        task.cancel()
+    password_executor.shutdown(wait=False)
+    image_executor.shutdown(wait=False)
+    for http_client in http_clients.values():
+        await http_client.aclose()
+    http_clients.clear()
     client.close()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="The Poll Winner backend maintenance commands")
+    parser.add_argument("command", choices=["ensure-indexes", "audit-indexes"])
+    args = parser.parse_args()
+    
+    async def main():
+        if args.command == "ensure-indexes":
+            created = await ensure_indexes()
+            print(f"Ensured {len(created)} indexes")
+        else:
+            results = await audit_query_plans()
+            print(json.dumps(results, indent=2))
+            scans = [r["name"] for r in results if r.get("collection_scan")]
+            if scans:
+                print(f"Collection scans: {', '.join(scans)}")
+                raise SystemExit(1)
+    
+    asyncio.run(main())
@@ -25,7 +25,9 @@ export const getPollHistory = () => api.get('/my-polls');
 
 // Wallet APIs
 export const getWallet = () => api.get('/wallet');
-export const getTransactions = () => api.get('/transactions');
+// One page of transactions; the X-Next-Cursor response header points at the next page
+export const getTransactions = (cursor) => api.get('/transactions', { params: cursor ? { cursor } : {} });
+export const getTransactionSummary = () => api.get('/transactions/summary');
 export const requestWithdrawal = (amount, upiId) => api.post('/withdrawal/request', { amount, upi_id: upiId });
 
 // User APIs
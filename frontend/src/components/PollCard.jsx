@@ -30,7 +30,7 @@ const PollCard = ({ poll, isResult = false }) => {
             </div>
             <div className="flex items-center gap-1.5 text-slate-400">
               <Users className="w-4 h-4" />
-              <span className="text-sm">{poll.options?.length} options</span>
+              <span className="text-sm">{poll.option_count ?? poll.options?.length} options</span>
             </div>
           </div>
           <div className="w-10 h-10 rounded-xl bg-sky-500/10 flex items-center justify-center group-hover:bg-sky-500 transition-all duration-300">
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Wallet, ShoppingCart, Trophy, ArrowDownToLine, TrendingUp, ArrowUpRight, ArrowDownRight, CreditCard } from 'lucide-react';
-import { getWallet, getTransactions, requestWithdrawal } from '../api';
+import { getWallet, getTransactions, getTransactionSummary, requestWithdrawal } from '../api';
 import { useToast } from '../components/Toast';
 import Loading from '../components/Loading';
 
@@ -8,7 +8,10 @@ const WalletPage = () => {
   const { showToast } = useToast();
   const [balance, setBalance] = useState(0);
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totals, setTotals] = useState({});
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadData();
@@ -16,12 +19,15 @@ const WalletPage = () => {
 
   const loadData = async () => {
     try {
-      const [walletRes, txnRes] = await Promise.all([
+      const [walletRes, txnRes, summaryRes] = await Promise.all([
         getWallet(),
         getTransactions(),
+        getTransactionSummary(),
       ]);
       setBalance(walletRes.data.balance || 0);
       setTransactions(txnRes.data || []);
+      setNextCursor(txnRes.headers['x-next-cursor'] || null);
+      setTotals(summaryRes.data.totals || {});
     } catch (err) {
       console.error('Failed to load wallet data');
     } finally {
@@ -29,6 +35,19 @@ const WalletPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const txnRes = await getTransactions(nextCursor);
+      setTransactions((current) => [...current, ...(txnRes.data || [])]);
+      setNextCursor(txnRes.headers['x-next-cursor'] || null);
+    } catch (err) {
+      showToast('Failed to load more transactions', 'error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleWithdraw = async () => {
     const amount = prompt('Enter withdrawal amount (minimum ₹100):');
     if (!amount || parseInt(amount) < 100) {
@@ -91,7 +110,7 @@ const WalletPage = () => {
               <span className="text-sm font-medium">Total Winnings</span>
             </div>
             <p className="text-2xl font-bold text-white">
-              ₹{transactions.filter(t => t.type === 'win').reduce((a, b) => a + b.amount, 0)}
+              ₹{totals.win?.amount || 0}
             </p>
           </div>
           <div className="p-6">
@@ -100,7 +119,7 @@ const WalletPage = () => {
               <span className="text-sm font-medium">Total Invested</span>
             </div>
             <p className="text-2xl font-bold text-white">
-              ₹{transactions.filter(t => t.type === 'purchase').reduce((a, b) => a + b.amount, 0)}
+              ₹{totals.purchase?.amount || 0}
             </p>
           </div>
         </div>
@@ -149,6 +168,14 @@ const WalletPage = () => {
             })}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="mt-6 text-center">
+            <button onClick={loadMore} disabled={loadingMore} className="btn btn-secondary">
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
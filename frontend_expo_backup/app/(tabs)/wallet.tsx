@@ -14,6 +14,7 @@ import {
 import { Ionicons } from '@expo/vector-icons';
 import axios from 'axios';
 import { useAuth } from '../../contexts/AuthContext';
+import { fetchAllPages } from '../../utils/paging';
 
 const BACKEND_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
 
@@ -49,12 +50,12 @@ export default function WalletScreen() {
 
   const fetchWalletData = async () => {
     try {
-      const [walletRes, transactionsRes] = await Promise.all([
+      const [walletRes, allTransactions] = await Promise.all([
         axios.get(`${BACKEND_URL}/api/wallet`, { withCredentials: true }),
-        axios.get(`${BACKEND_URL}/api/transactions`, { withCredentials: true }),
+        fetchAllPages<Transaction>(`${BACKEND_URL}/api/transactions`),
       ]);
       setWallet(walletRes.data);
-      setTransactions(transactionsRes.data);
+      setTransactions(allTransactions);
     } catch (error) {
       console.error('Error fetching wallet data:', error);
     } finally {
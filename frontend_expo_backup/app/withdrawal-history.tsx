@@ -10,7 +10,7 @@ import {
 } from 'react-native';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import axios from 'axios';
+import { fetchAllPages } from '../utils/paging';
 
 const BACKEND_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
 
@@ -37,10 +37,7 @@ export default function WithdrawalHistoryScreen() {
 
   const fetchWithdrawals = async () => {
     try {
-      const response = await axios.get(`${BACKEND_URL}/api/withdrawal/history`, {
-        withCredentials: true,
-      });
-      setWithdrawals(response.data);
+      setWithdrawals(await fetchAllPages<Withdrawal>(`${BACKEND_URL}/api/withdrawal/history`));
     } catch (error) {
       console.error('Error fetching withdrawals:', error);
     } finally {
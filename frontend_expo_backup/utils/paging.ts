@@ -0,0 +1,17 @@
+import axios from 'axios';
+
+// Lists such as /api/transactions come a page at a time; the X-Next-Cursor
+// response header points at the next page. Follow it to the end.
+export const fetchAllPages = async <T>(url: string): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await axios.get(url, {
+      withCredentials: true,
+      params: cursor ? { cursor } : {},
+    });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
@@ -0,0 +1,92 @@
+"""Fixtures for running the backend in-process against an in-memory MongoDB (mongomock-motor)"""
+import os
+import sys
+import uuid
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "thepollwinner_test")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# mongomock has no GridFS
+os.environ.setdefault("IMAGE_STORE", "local")
+os.environ.setdefault("IMAGE_STORE_DIR", tempfile.mkdtemp(prefix="pollwinner-images-"))
+
+import motor.motor_asyncio  # noqa: E402
+
+motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    # One app lifecycle per run: executors and background workers are process-wide
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def client(app_client):
+    """Running app, pointed at a fresh database for each test"""
+    server.db = server.client[f"test_{uuid.uuid4().hex[:8]}"]
+    app_client.portal.call(server.ensure_indexes)
+    app_client.cookies.clear()
+    yield app_client
+
+
+@pytest.fixture
+def call(client):
+    """Run a coroutine function on the app's event loop, e.g. call(server.db.votes.count_documents, {})"""
+    return client.portal.call
+
+
+@pytest.fixture
+def run_concurrently(client):
+    """Send requests at the same time through the app's event loop; returns the responses in order"""
+    def run(*requests):
+        async def send():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as async_client:
+                return await asyncio.gather(*(async_client.request(method, url, **kwargs) for method, url, kwargs in requests))
+        return client.portal.call(send)
+    return run
+
+
+@pytest.fixture
+def admin_headers(client):
+    response = client.post("/api/auth/admin/register", json={"email": "admin@test.com", "name": "Admin", "password": "secret"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a user; returns (user_id, auth headers)"""
+    def make(email: str = None, name: str = "Voter"):
+        email = email or f"user_{uuid.uuid4().hex[:8]}@test.com"
+        response = client.post("/api/auth/register", json={"email": email, "password": "secret", "name": name})
+        # Session cookies take precedence over the header; each user is identified by its headers
+        client.cookies.clear()
+        return response.json()["user_id"], {"Authorization": f"Bearer {response.cookies['session_token']}"}
+    return make
+
+
+@pytest.fixture
+def poll(client, admin_headers):
+    """An active two-option poll at 2 per vote"""
+    response = client.post(
+        "/api/admin/polls",
+        json={"title": "Test poll", "description": "For tests", "options": [{"text": "Yes"}, {"text": "No"}], "price_per_vote": 2},
+        headers=admin_headers
+    )
+    return response.json()
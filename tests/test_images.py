@@ -0,0 +1,48 @@
+import asyncio
+import base64
+import io
+import struct
+import zlib
+
+from PIL import Image
+
+import server
+
+
+def png_bytes(width: int = 1, height: int = 1) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (1, 1), "red").save(out, format="PNG")
+    data = out.getvalue()
+    if (width, height) == (1, 1):
+        return data
+    # Claim a huge canvas in the header; the compressed pixel data stays tiny
+    ihdr = b"IHDR" + struct.pack(">II", width, height) + data[24:29]
+    return data[:12] + ihdr + struct.pack(">I", zlib.crc32(ihdr)) + data[33:]
+
+
+def test_decompression_bomb_is_rejected_as_invalid(client, admin_headers):
+    bomb = base64.b64encode(png_bytes(30000, 30000)).decode()
+    response = client.post(
+        "/api/admin/polls",
+        json={"title": "Bomb", "description": "", "options": [{"text": "A", "image_base64": bomb}, {"text": "B"}], "price_per_vote": 2},
+        headers=admin_headers
+    )
+    assert response.status_code == 400
+
+
+def test_workers_starting_together_migrate_each_poll_once(client, call):
+    inline = base64.b64encode(png_bytes()).decode()
+    call(server.db.polls.insert_many, [
+        {"poll_id": f"poll_{i}", "version": 1, "options": [{"option_id": "opt_a", "text": "A", "image_base64": inline}]}
+        for i in range(3)
+    ])
+
+    async def start_workers():
+        return await asyncio.gather(*(server.migrate_inline_images() for _ in range(4)))
+
+    assert sum(call(start_workers)) == 3
+    for poll in call(server.db.polls.find({}, {"_id": 0}).to_list, None):
+        assert poll["version"] == 2
+        assert "image_migration_until" not in poll
+        assert "image_base64" not in poll["options"][0]
+        assert poll["options"][0]["image_url"].startswith("/api/images/")
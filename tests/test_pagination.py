@@ -0,0 +1,54 @@
+from datetime import datetime, timezone, timedelta
+
+import server
+
+
+def test_pending_withdrawals_are_reachable_page_by_page(client, call, admin_headers):
+    start = datetime.now(timezone.utc)
+    call(server.db.withdrawals.insert_many, [
+        {
+            "withdrawal_id": f"withdrawal_{i:03d}",
+            "user_id": "user_x",
+            "amount": 100.0,
+            "status": "pending" if i % 3 == 0 else "approved",
+            "created_at": start - timedelta(minutes=i)
+        }
+        for i in range(30)
+    ])
+
+    seen = []
+    params = {"status": "pending", "limit": 4}
+    while True:
+        response = client.get("/api/admin/withdrawals", params=params, headers=admin_headers)
+        seen.extend(w["withdrawal_id"] for w in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {**params, "cursor": cursor}
+
+    # Newest first, every pending withdrawal exactly once, nothing else
+    assert seen == [f"withdrawal_{i:03d}" for i in range(0, 30, 3)]
+
+
+def test_transaction_summary_covers_every_page(client, call, make_user):
+    user_id, headers = make_user()
+    start = datetime.now(timezone.utc)
+    call(server.db.transactions.insert_many, [
+        {
+            "transaction_id": f"txn_{i:03d}",
+            "user_id": user_id,
+            "poll_id": f"poll_{i:03d}",
+            "type": "win" if i % 2 else "purchase",
+            "amount": 10.0,
+            "status": "success",
+            "created_at": start - timedelta(minutes=i)
+        }
+        for i in range(150)
+    ])
+
+    page = client.get("/api/transactions", headers=headers)
+    assert len(page.json()) == server.DEFAULT_PAGE_SIZE
+    assert page.headers.get("X-Next-Cursor")
+
+    totals = client.get("/api/transactions/summary", headers=headers).json()["totals"]
+    assert totals == {"win": {"amount": 750.0, "count": 75}, "purchase": {"amount": 750.0, "count": 75}}
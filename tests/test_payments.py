@@ -0,0 +1,136 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+VOTES = 3
+PRICE = 2
+
+
+@pytest.fixture(params=[False, True], ids=["direct", "batched"])
+def vote_batching(request, call, monkeypatch):
+    """Run each test with votes written directly and through the group-commit queue"""
+    if request.param and server.vote_ingestor.runner is None:
+        async def start():
+            server.vote_ingestor.start()
+        call(start)
+    monkeypatch.setattr(server, "VOTE_BATCHING", request.param)
+    return request.param
+
+
+@pytest.fixture
+def order(call, make_user, poll):
+    """A pending purchase of VOTES votes for the poll's first option"""
+    user_id, _ = make_user()
+    order_id = f"order_{uuid.uuid4().hex[:12]}"
+    call(server.db.transactions.insert_one, {
+        "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
+        "user_id": user_id,
+        "type": "purchase",
+        "amount": float(VOTES * PRICE),
+        "status": "pending",
+        "poll_id": poll["poll_id"],
+        "cashfree_order_id": order_id,
+        "vote_count": VOTES,
+        "option_id": poll["options"][0]["option_id"],
+        "created_at": datetime.now(timezone.utc)
+    })
+    return {"order_id": order_id, "user_id": user_id, "poll": poll}
+
+
+def callback(client, order):
+    response = client.get("/api/payment/callback", params={"order_id": order["order_id"]}, follow_redirects=False)
+    assert response.headers["location"] == "/?payment=success"
+
+
+def webhook(client, call, order):
+    response = client.post("/api/payments/webhook", json={"type": "PAYMENT_SUCCESS_WEBHOOK", "data": {"order": {"order_id": order["order_id"]}}})
+    event_id = response.json()["event_id"]
+    deadline = time.monotonic() + 5
+    while call(server.db.webhook_inbox.find_one, {"event_id": event_id})["status"] != "done":
+        assert time.monotonic() < deadline, "webhook was not processed"
+        time.sleep(0.02)
+
+
+def assert_applied_once(client, call, order):
+    poll_id = order["poll"]["poll_id"]
+    option_id = order["poll"]["options"][0]["option_id"]
+    balance = call(server.db.vote_balances.find_one, {"user_id": order["user_id"], "poll_id": poll_id})
+    assert (balance["purchased"], balance["cast"], balance["available"]) == (VOTES, VOTES, 0)
+    assert call(server.db.votes.count_documents, {"cashfree_order_id": order["order_id"]}) == 1
+    transaction = call(server.db.transactions.find_one, {"cashfree_order_id": order["order_id"]})
+    assert transaction["status"] == "success"
+
+    results = client.get(f"/api/polls/{poll_id}/results").json()
+    assert results["total_votes"] == VOTES
+    tally = next(r for r in results["option_results"] if r["option_id"] == option_id)
+    assert tally["vote_count"] == VOTES
+    summary = call(server.db.user_poll_summary.find_one, {"user_id": order["user_id"], "poll_id": poll_id})
+    assert summary["total_votes"] == VOTES
+
+
+def test_replayed_callback_casts_once(client, call, run_concurrently, vote_batching, order):
+    url = f"/api/payment/callback?order_id={order['order_id']}"
+    responses = run_concurrently(*[("GET", url, {"follow_redirects": False})] * 2)
+    assert all(r.headers["location"] == "/?payment=success" for r in responses)
+    callback(client, order)
+    assert_applied_once(client, call, order)
+
+
+def test_webhook_then_callback_casts_once(client, call, vote_batching, order):
+    webhook(client, call, order)
+    callback(client, order)
+    assert_applied_once(client, call, order)
+
+
+def test_callback_then_webhook_casts_once(client, call, vote_batching, order):
+    callback(client, order)
+    webhook(client, call, order)
+    assert_applied_once(client, call, order)
+
+
+def test_callback_retried_after_a_failed_vote_write_credits_the_purchase(client, call, vote_batching, order, monkeypatch):
+    store_vote = server.store_vote
+
+    async def unavailable(vote, poll):
+        raise server.HTTPException(status_code=503, detail="Too many votes in flight, please retry")
+
+    monkeypatch.setattr(server, "store_vote", unavailable)
+    response = client.get("/api/payment/callback", params={"order_id": order["order_id"]}, follow_redirects=False)
+    assert response.status_code == 200
+    balance = call(server.db.vote_balances.find_one, {"user_id": order["user_id"], "poll_id": order["poll"]["poll_id"]})
+    assert (balance["purchased"], balance["cast"], balance["available"]) == (VOTES, 0, VOTES)
+
+    monkeypatch.setattr(server, "store_vote", store_vote)
+    callback(client, order)
+    assert_applied_once(client, call, order)
+
+
+def test_rebuilt_balances_remember_credited_orders(client, call, vote_batching, order):
+    callback(client, order)
+    call(server.db.vote_balances.delete_many, {})
+    call(server.rebuild_vote_balances)
+    callback(client, order)
+    assert_applied_once(client, call, order)
+
+
+def test_webhook_retry_finishes_a_failed_credit(client, call, order, monkeypatch):
+    apply_order = server.apply_order_to_vote_balance
+    failures = []
+
+    async def flaky(*args, **kwargs):
+        if not failures:
+            failures.append(args)
+            raise RuntimeError("balance write failed")
+        return await apply_order(*args, **kwargs)
+
+    monkeypatch.setattr(server, "apply_order_to_vote_balance", flaky)
+    monkeypatch.setattr(server, "WEBHOOK_RETRY_BASE_SECONDS", 0.05)
+    webhook(client, call, order)
+    assert failures
+
+    balance = call(server.db.vote_balances.find_one, {"user_id": order["user_id"], "poll_id": order["poll"]["poll_id"]})
+    assert (balance["purchased"], balance["cast"], balance["available"]) == (VOTES, 0, VOTES)
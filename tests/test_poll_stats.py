@@ -0,0 +1,33 @@
+import server
+
+
+def test_stats_voter_pages_cover_every_voter_once(client, call, admin_headers, make_user, poll):
+    poll_id = poll["poll_id"]
+    option_id = poll["options"][0]["option_id"]
+    voters = []
+    for _ in range(7):
+        user_id, headers = make_user()
+        call(server.adjust_vote_balance, user_id, poll_id, 1)
+        client.post(f"/api/polls/{poll_id}/vote", json={"option_id": option_id, "vote_count": 1}, headers=headers)
+        voters.append(user_id)
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        response = client.get(f"/api/admin/polls/{poll_id}/stats", params=params, headers=admin_headers)
+        body = response.json()
+        assert body["voter_breakdown"] == {"pending": 7}
+        assert len(body["voter_details"]) <= 3
+        seen.extend(v["user_id"] for v in body["voter_details"])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {"limit": 3, "cursor": cursor}
+
+    assert sorted(seen) == sorted(voters)
+    assert len(seen) == len(set(seen))
+
+
+def test_stats_rejects_a_malformed_cursor(client, admin_headers, poll):
+    response = client.get(f"/api/admin/polls/{poll['poll_id']}/stats", params={"cursor": "user_abc"}, headers=admin_headers)
+    assert response.status_code == 400
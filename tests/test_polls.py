@@ -0,0 +1,18 @@
+import server
+
+
+def test_option_count_backfill_leaves_counters_alone(client, call):
+    call(server.db.polls.insert_many, [
+        {"poll_id": "poll_old", "options": [{"option_id": "a"}, {"option_id": "b"}, {"option_id": "c"}],
+         "total_votes": 7, "aggregates_version": server.POLL_AGGREGATES_VERSION},
+        {"poll_id": "poll_new", "options": [{"option_id": "a"}], "option_count": 1, "total_votes": 2,
+         "aggregates_version": server.POLL_AGGREGATES_VERSION}
+    ])
+
+    assert call(server.backfill_option_counts).modified_count == 1
+    assert call(server.backfill_option_counts).modified_count == 0
+
+    polls = {p["poll_id"]: p for p in call(server.db.polls.find({}, {"_id": 0}).to_list, None)}
+    assert polls["poll_old"]["option_count"] == 3
+    assert polls["poll_old"]["total_votes"] == 7
+    assert polls["poll_new"]["option_count"] == 1
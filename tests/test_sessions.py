@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import jwt
+
+import server
+
+
+def forge(user_id: str, secret: str) -> dict:
+    token = jwt.encode({"typ": "user", "jti": "forged", "user_id": user_id, "iat": time.time(), "exp": time.time() + 3600}, secret, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_opaque_mode_rejects_signed_tokens(client, make_user, monkeypatch):
+    user_id, _ = make_user()
+    monkeypatch.setattr(server, "USER_SESSION_SECRET", "a-real-secret")
+    assert server.USER_SESSION_MODE == "opaque"
+    assert client.get("/api/wallet", headers=forge(user_id, server.DEFAULT_SECRET_KEY)).status_code == 401
+    assert client.get("/api/wallet", headers=forge(user_id, "a-real-secret")).status_code == 401
+
+
+def test_signed_mode_rejects_tokens_signed_with_the_placeholder(client, make_user, monkeypatch):
+    user_id, _ = make_user()
+    monkeypatch.setattr(server, "USER_SESSION_MODE", "signed")
+    monkeypatch.setattr(server, "USER_SESSION_SECRET", server.DEFAULT_SECRET_KEY)
+    assert client.get("/api/wallet", headers=forge(user_id, server.DEFAULT_SECRET_KEY)).status_code == 401
+
+
+def test_admin_edit_revokes_signed_sessions(client, admin_headers, make_user, monkeypatch):
+    monkeypatch.setattr(server, "USER_SESSION_MODE", "signed")
+    monkeypatch.setattr(server, "USER_SESSION_SECRET", "a-real-secret")
+    user_id, headers = make_user(email="signed@test.com", name="Old Name")
+    assert client.get("/api/auth/me", headers=headers).json()["name"] == "Old Name"
+
+    response = client.put(f"/api/admin/users/{user_id}", json={"name": "New Name"}, headers=admin_headers)
+    assert response.status_code == 200
+
+    # The old token carries the old profile, so it must not be accepted any more
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    login = client.post("/api/auth/login", json={"email": "signed@test.com", "password": "secret"})
+    client.cookies.clear()
+    fresh = {"Authorization": f"Bearer {login.cookies['session_token']}"}
+    assert client.get("/api/auth/me", headers=fresh).json()["name"] == "New Name"
+
+
+def test_signed_sessions_refuse_placeholder_secret():
+    env = {
+        **os.environ,
+        "MONGO_URL": "mongodb://localhost:27017",
+        "DB_NAME": "unused",
+        "USER_SESSION_MODE": "signed",
+        "SECRET_KEY": server.DEFAULT_SECRET_KEY
+    }
+    env.pop("USER_SESSION_SECRET", None)
+    result = subprocess.run([sys.executable, "-c", "import server"], cwd=Path(server.__file__).parent, env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "USER_SESSION_SECRET" in result.stderr
@@ -0,0 +1,157 @@
+import time
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+
+def vote(client, call, headers, user_id, poll_id, option_id, count):
+    call(server.adjust_vote_balance, user_id, poll_id, count)
+    response = client.post(f"/api/polls/{poll_id}/vote", json={"option_id": option_id, "vote_count": count}, headers=headers)
+    assert response.status_code == 200
+
+
+def settle(client, admin_headers, poll_id, option_id) -> dict:
+    response = client.post(f"/api/admin/polls/{poll_id}/result", json={"winning_option_id": option_id}, headers=admin_headers)
+    job_id = response.json()["job_id"]
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/admin/settlements/{job_id}", headers=admin_headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.02)
+    pytest.fail("settlement did not finish")
+
+
+def wallets_and_wins(call, poll_id):
+    wallets = call(lambda: server.db.wallets.find({}, {"_id": 0, "user_id": 1, "balance": 1}).to_list(None))
+    wins = call(lambda: server.db.transactions.find({"poll_id": poll_id, "type": "win"}, {"_id": 0, "user_id": 1, "amount": 1}).to_list(None))
+    return sorted((w["user_id"], w["balance"]) for w in wallets), sorted((t["user_id"], t["amount"]) for t in wins)
+
+
+def test_rerunning_settlement_credits_nobody_twice(client, call, admin_headers, make_user, poll):
+    poll_id = poll["poll_id"]
+    win_option, lose_option = (option["option_id"] for option in poll["options"])
+    winners = [make_user() for _ in range(3)]
+    loser_id, loser_headers = make_user()
+    for count, (user_id, headers) in zip([1, 2, 3], winners):
+        vote(client, call, headers, user_id, poll_id, win_option, count)
+    vote(client, call, loser_headers, loser_id, poll_id, lose_option, 6)
+
+    job = settle(client, admin_headers, poll_id, win_option)
+    assert job["status"] == "completed"
+    wallets, wins = wallets_and_wins(call, poll_id)
+    # The losing pool (6 votes at 2) is shared per winning vote
+    assert sorted(amount for _, amount in wins) == [2.0, 4.0, 6.0]
+
+    # Replay the whole job from the start, as a second worker would after a lost lease
+    call(server.db.settlement_jobs.update_one, {"job_id": job["job_id"]}, {"$set": {
+        "status": "pending", "last_user_id": None, "locked_until": None, "attempts": 0
+    }})
+    rerun = call(server.claim_settlement_job, job["job_id"])
+    call(server.run_settlement_job, rerun)
+
+    assert wallets_and_wins(call, poll_id) == (wallets, wins)
+    assert call(server.db.settlement_jobs.find_one, {"job_id": job["job_id"]})["status"] == "completed"
+
+
+def test_run_that_lost_its_lease_stops(client, call, admin_headers, make_user, poll):
+    poll_id = poll["poll_id"]
+    win_option = poll["options"][0]["option_id"]
+    user_id, headers = make_user()
+    vote(client, call, headers, user_id, poll_id, win_option, 2)
+    job = settle(client, admin_headers, poll_id, win_option)
+
+    call(server.db.settlement_jobs.update_one, {"job_id": job["job_id"]}, {"$set": {"status": "pending", "last_user_id": None, "locked_until": None}})
+    stale = call(server.claim_settlement_job, job["job_id"])
+    # Another run takes the lease over before the stale one writes anything
+    call(server.db.settlement_jobs.update_one, {"job_id": job["job_id"]}, {"$set": {"lease_id": "other"}})
+    before = call(server.db.settlement_jobs.find_one, {"job_id": job["job_id"]}, {"_id": 0})
+    call(server.run_settlement_job, stale)
+
+    after = call(server.db.settlement_jobs.find_one, {"job_id": job["job_id"]}, {"_id": 0})
+    assert after["winners_credited"] == before["winners_credited"]
+    assert after["status"] == "running"
+
+
+def test_win_transactions_are_unique_per_user_and_poll(client, call):
+    call(server.db.transactions.insert_one, {"transaction_id": "t1", "user_id": "u", "poll_id": "p", "type": "win"})
+    with pytest.raises(DuplicateKeyError):
+        call(server.db.transactions.insert_one, {"transaction_id": "t2", "user_id": "u", "poll_id": "p", "type": "win"})
+
+
+def test_job_out_of_attempts_can_be_retried_by_an_admin(client, call, admin_headers, make_user, poll, monkeypatch):
+    poll_id = poll["poll_id"]
+    win_option, lose_option = (option["option_id"] for option in poll["options"])
+    winner_id, winner_headers = make_user()
+    loser_id, loser_headers = make_user()
+    vote(client, call, winner_headers, winner_id, poll_id, win_option, 1)
+    vote(client, call, loser_headers, loser_id, poll_id, lose_option, 1)
+
+    compute_totals = server.compute_settlement_totals
+
+    async def unavailable(*args):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(server, "SETTLEMENT_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(server, "compute_settlement_totals", unavailable)
+    job = settle(client, admin_headers, poll_id, win_option)
+    assert job["status"] == "failed"
+    # Out of attempts: the sweeper leaves it alone
+    assert call(server.claim_settlement_job) is None
+    failed = client.get("/api/admin/settlements", params={"status": "failed"}, headers=admin_headers).json()
+    assert [j["job_id"] for j in failed] == [job["job_id"]]
+
+    monkeypatch.setattr(server, "compute_settlement_totals", compute_totals)
+    response = client.post(f"/api/admin/settlements/{job['job_id']}/retry", headers=admin_headers)
+    assert response.status_code == 200
+    deadline = time.monotonic() + 10
+    while call(server.db.settlement_jobs.find_one, {"job_id": job["job_id"]})["status"] != "completed":
+        assert time.monotonic() < deadline, "retried settlement did not finish"
+        time.sleep(0.02)
+
+    assert call(server.db.polls.find_one, {"poll_id": poll_id})["status"] == "closed"
+    assert call(server.db.wallets.find_one, {"user_id": winner_id})["balance"] == 2.0
+    assert client.post(f"/api/admin/settlements/{job['job_id']}/retry", headers=admin_headers).status_code == 404
+
+
+def test_sweeper_finishes_a_job_whose_request_died_before_the_poll_changed(client, call, make_user, poll):
+    poll_id = poll["poll_id"]
+    win_option, lose_option = (option["option_id"] for option in poll["options"])
+    winner_id, winner_headers = make_user()
+    loser_id, loser_headers = make_user()
+    vote(client, call, winner_headers, winner_id, poll_id, win_option, 1)
+    vote(client, call, loser_headers, loser_id, poll_id, lose_option, 1)
+
+    # The result request stored its job and stopped; the poll is still active
+    call(server.db.settlement_jobs.insert_one, {
+        "job_id": "settle_orphan", "poll_id": poll_id, "winning_option_id": win_option, "status": "pending",
+        "attempts": 0, "per_vote_share": None, "winners_credited": 0, "amount_credited": 0.0,
+        "last_user_id": None, "locked_until": None
+    })
+    call(server.run_settlement_job, call(server.claim_settlement_job))
+
+    settled = call(server.db.polls.find_one, {"poll_id": poll_id})
+    assert (settled["status"], settled["result_option_id"], settled["settlement_job_id"]) == ("closed", win_option, "settle_orphan")
+    assert call(server.db.wallets.find_one, {"user_id": winner_id})["balance"] == 2.0
+
+
+def test_second_job_for_a_settled_poll_is_cancelled(client, call, admin_headers, make_user, poll):
+    poll_id = poll["poll_id"]
+    win_option, lose_option = (option["option_id"] for option in poll["options"])
+    user_id, headers = make_user()
+    vote(client, call, headers, user_id, poll_id, win_option, 2)
+    settle(client, admin_headers, poll_id, win_option)
+    before = wallets_and_wins(call, poll_id)
+
+    call(server.db.settlement_jobs.insert_one, {
+        "job_id": "settle_other", "poll_id": poll_id, "winning_option_id": lose_option, "status": "pending",
+        "attempts": 0, "per_vote_share": None, "winners_credited": 0, "amount_credited": 0.0,
+        "last_user_id": None, "locked_until": None
+    })
+    call(server.run_settlement_job, call(server.claim_settlement_job))
+
+    assert call(server.db.settlement_jobs.find_one, {"job_id": "settle_other"})["status"] == "cancelled"
+    assert call(server.db.polls.find_one, {"poll_id": poll_id})["result_option_id"] == win_option
+    assert wallets_and_wins(call, poll_id) == before
@@ -0,0 +1,51 @@
+import server
+
+
+def test_concurrent_votes_cannot_overspend(client, call, run_concurrently, make_user, poll):
+    user_id, headers = make_user()
+    poll_id = poll["poll_id"]
+    option_id = poll["options"][0]["option_id"]
+    call(server.adjust_vote_balance, user_id, poll_id, 5)
+
+    responses = run_concurrently(*[
+        ("POST", f"/api/polls/{poll_id}/vote", {"json": {"option_id": option_id, "vote_count": 3}, "headers": headers})
+        for _ in range(8)
+    ])
+
+    assert sorted(r.status_code for r in responses) == [200] + [400] * 7
+    balance = call(server.db.vote_balances.find_one, {"user_id": user_id, "poll_id": poll_id}, {"_id": 0})
+    assert (balance["purchased"], balance["cast"], balance["available"]) == (5, 3, 2)
+    assert call(server.db.votes.count_documents, {"user_id": user_id, "poll_id": poll_id}) == 1
+
+
+def test_vote_spends_exact_balance(client, call, make_user, poll):
+    user_id, headers = make_user()
+    poll_id = poll["poll_id"]
+    option_id = poll["options"][0]["option_id"]
+    call(server.adjust_vote_balance, user_id, poll_id, 4)
+
+    first = client.post(f"/api/polls/{poll_id}/vote", json={"option_id": option_id, "vote_count": 4}, headers=headers)
+    second = client.post(f"/api/polls/{poll_id}/vote", json={"option_id": option_id, "vote_count": 1}, headers=headers)
+
+    assert first.status_code == 200 and first.json()["remaining_votes"] == 0
+    assert second.status_code == 400
+    balance = call(server.db.vote_balances.find_one, {"user_id": user_id, "poll_id": poll_id}, {"_id": 0})
+    assert balance["available"] == 0
+
+
+def test_stored_vote_is_not_refunded_when_the_tally_fails(client, call, make_user, poll, monkeypatch):
+    user_id, headers = make_user()
+    poll_id = poll["poll_id"]
+    option_id = poll["options"][0]["option_id"]
+    call(server.adjust_vote_balance, user_id, poll_id, 3)
+
+    async def failing_tally(*args):
+        raise RuntimeError("summary write failed")
+
+    monkeypatch.setattr(server, "record_vote_tally", failing_tally)
+    response = client.post(f"/api/polls/{poll_id}/vote", json={"option_id": option_id, "vote_count": 3}, headers=headers)
+
+    assert response.status_code == 200
+    balance = call(server.db.vote_balances.find_one, {"user_id": user_id, "poll_id": poll_id}, {"_id": 0})
+    assert (balance["cast"], balance["available"]) == (3, 0)
+    assert call(server.db.votes.count_documents, {"user_id": user_id, "poll_id": poll_id}) == 1